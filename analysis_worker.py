@@ -0,0 +1,258 @@
+import os
+import time
+import queue
+import uuid
+import itertools
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from PIL import Image
+from PyQt5.QtCore import QObject, pyqtSignal
+from prompt_presets import DEFAULT_ACTIVE, resolve_presets, format_results
+
+# Attempts per capture before giving up, so one bad frame can't crash-loop the worker
+MAX_ATTEMPTS = 2
+POLL_INTERVAL = 0.5
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+# A worker that dies this many times in a row right after starting is broken, stop restarting it
+MAX_STARTUP_FAILURES = 5
+# A worker that ran this long, or delivered a result, counts as having started fine
+STARTUP_GRACE = 10.0
+
+
+def worker_main(job_queue, result_queue):
+    """Worker process loop: decode frames from shared memory, save, encode and analyze them"""
+    from dotenv import load_dotenv
+    from openai import OpenAI
+    from vision import encode_png, RETRYABLE_ERRORS
+    from prompt_presets import analyze_with_presets
+    from tiling import encode_payload
+
+    load_dotenv()
+    client = OpenAI()
+    while True:
+        job = job_queue.get()
+        if job is None:
+            return
+
+        try:
+            # Spawned workers share the app's resource tracker, so attaching here doesn't
+            # take ownership of the segment, the app unlinks it once the result is in
+            shm = shared_memory.SharedMemory(name=job['shm_name'])
+            try:
+                # Copy out so no view of the segment outlives close()
+                data = bytes(shm.buf[:job['nbytes']])
+            finally:
+                shm.close()
+            image = Image.frombytes(job['mode'], job['size'], data)
+            png = encode_png(image)
+
+            with open(job['screenshot_path'], 'wb') as f:
+                f.write(png)
+            payload = encode_payload(image, png)
+
+            def on_result(name, preset_text):
+                result_queue.put({'id': job['id'], 'preset': name, 'text': preset_text})
+
+            text = analyze_with_presets(payload, job['presets'], on_result, client)
+            result_queue.put({'id': job['id'], 'text': text, 'error': None})
+        except RETRYABLE_ERRORS as e:
+            result_queue.put({'id': job['id'], 'text': None, 'error': str(e), 'retryable': True})
+        except Exception as e:
+            result_queue.put({'id': job['id'], 'text': None, 'error': str(e)})
+
+
+class AnalysisWorker(QObject):
+    """Runs PNG/base64 encoding and API calls in a separate process
+
+    Captured frames are copied once into a shared memory segment and only
+    the segment name crosses the process boundary, so frames are never
+    pickled. Results come back on a listener thread and are re-emitted on
+    the Qt thread through SignalManager. If the process dies, it is started
+    again with exponential backoff and the captures it was working on are
+    resubmitted. A worker that keeps dying on startup is given up on.
+    """
+    result_ready = pyqtSignal(object)
+
+    def __init__(self, signal_manager, offline_queue=None):
+        super().__init__()
+        self.signal_manager = signal_manager
+        self.offline_queue = offline_queue
+        self.context = multiprocessing.get_context('spawn')
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.process = None
+        self.stopping = False
+        self.failed = False
+        self.started_at = 0.0
+        self.healthy = False
+        self.startup_failures = 0
+        self.result_ready.connect(self.deliver_result)
+
+    def start(self):
+        """Start the worker process and the result listener"""
+        self.start_process()
+        self.listener = threading.Thread(target=self.listen, daemon=True)
+        self.listener.start()
+
+    def start_process(self):
+        # Fresh queues each time, a queue can be left corrupted by a process killed mid-write
+        self.job_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.process = self.context.Process(
+            target=worker_main,
+            args=(self.job_queue, self.result_queue),
+            daemon=True
+        )
+        self.started_at = time.monotonic()
+        self.healthy = False
+        self.process.start()
+
+    def available(self):
+        """False once the worker was given up on, captures then have to be analyzed elsewhere"""
+        return not self.failed
+
+    def submit(self, image, screenshot_path, presets=None):
+        """Hand a captured frame to the worker, it saves it to screenshot_path and runs the presets on it"""
+        presets = presets or resolve_presets([DEFAULT_ACTIVE])
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        data = image.tobytes()
+        shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[:len(data)] = data
+
+        job = {
+            'id': next(self.ids),
+            'shm_name': shm.name,
+            'mode': image.mode,
+            'size': image.size,
+            'nbytes': len(data),
+            'screenshot_path': screenshot_path,
+            'presets': presets,
+        }
+
+        entry_id = None
+        if len(presets) > 1:
+            # Several answers fill in one chat entry as they arrive, so show it right away
+            entry_id = uuid.uuid4().hex
+            self.signal_manager.capture_queued.emit(entry_id, screenshot_path, format_results(presets, {}))
+
+        with self.lock:
+            self.pending[job['id']] = {'job': job, 'shm': shm, 'attempts': 1,
+                                       'entry_id': entry_id, 'results': {}}
+            self.job_queue.put(job)
+        return job['id']
+
+    def listen(self):
+        """Collect results from the worker and restart it if it dies"""
+        while not self.stopping:
+            try:
+                result = self.result_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not self.stopping and not self.process.is_alive() and not self.restart():
+                    return
+                continue
+            except (EOFError, OSError):
+                continue
+            self.healthy = True
+            self.result_ready.emit(result)
+
+    def restart(self):
+        """Start a new worker process and resubmit the captures that were in flight
+
+        Returns False instead once the worker died on startup too many times in a row.
+        """
+        if self.healthy or time.monotonic() - self.started_at > STARTUP_GRACE:
+            self.startup_failures = 0
+        self.startup_failures += 1
+        if self.startup_failures >= MAX_STARTUP_FAILURES:
+            self.give_up()
+            return False
+
+        delay = min(RESTART_DELAY * 2 ** (self.startup_failures - 1), MAX_RESTART_DELAY)
+        print(f"Analysis worker exited with code {self.process.exitcode}, restarting in {delay:.0f}s")
+        time.sleep(delay)
+        if self.stopping:
+            return False
+        failed = []
+        with self.lock:
+            self.start_process()
+            for job_id, entry in list(self.pending.items()):
+                if entry['attempts'] >= MAX_ATTEMPTS:
+                    failed.append({'id': job_id, 'text': None,
+                                   'error': "analysis worker crashed while processing this capture"})
+                    continue
+                entry['attempts'] += 1
+                self.job_queue.put(entry['job'])
+        for result in failed:
+            self.result_ready.emit(result)
+        return True
+
+    def give_up(self):
+        """Fail the captures in flight and report that the worker can't be started"""
+        self.failed = True
+        message = (f"The analysis worker process exited on startup {self.startup_failures} times in a row "
+                   f"(last exit code {self.process.exitcode}), captures are analyzed in the app from now on")
+        print(message)
+        with self.lock:
+            failed = [{'id': job_id, 'text': None, 'error': "the analysis worker could not be started"}
+                      for job_id in self.pending]
+        for result in failed:
+            self.result_ready.emit(result)
+        self.signal_manager.screenshot_taken.emit(f"Error analyzing image: {message}", None)
+
+    def deliver_result(self, result):
+        """Runs on the Qt thread: release the frame and pass the result on"""
+        with self.lock:
+            if 'preset' in result:
+                entry = self.pending.get(result['id'])
+            else:
+                entry = self.pending.pop(result['id'], None)
+        if entry is None:
+            return
+
+        presets = entry['job']['presets']
+        entry_id = entry['entry_id']
+        if 'preset' in result:
+            # One answer of several, the capture is still in flight
+            if entry_id is not None:
+                entry['results'][result['preset']] = result['text']
+                self.signal_manager.response_updated.emit(entry_id, format_results(presets, entry['results']))
+            return
+
+        entry['shm'].close()
+        entry['shm'].unlink()
+
+        screenshot_path = entry['job']['screenshot_path']
+        if result.get('retryable') and self.offline_queue is not None and os.path.exists(screenshot_path):
+            # The worker saved the PNG before the request failed, retry it from the offline queue
+            status = f"Queued for analysis, it will be retried automatically ({result['error']})"
+            if entry_id is not None:
+                self.offline_queue.enqueue(screenshot_path, presets, entry_id)
+                self.signal_manager.response_updated.emit(entry_id, status)
+            else:
+                entry_id = self.offline_queue.enqueue(screenshot_path, presets)
+                self.signal_manager.capture_queued.emit(entry_id, screenshot_path, status)
+        elif entry_id is not None:
+            text = f"Error analyzing image: {result['error']}" if result['error'] else result['text']
+            self.signal_manager.response_updated.emit(entry_id, text)
+        elif result['error']:
+            self.signal_manager.screenshot_taken.emit(f"Error analyzing image: {result['error']}", None)
+        else:
+            self.signal_manager.screenshot_taken.emit(result['text'], screenshot_path)
+
+    def stop(self):
+        """Shut the worker down and free any frames still waiting"""
+        self.stopping = True
+        if self.process is not None and self.process.is_alive():
+            self.job_queue.put(None)
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+        with self.lock:
+            for entry in self.pending.values():
+                entry['shm'].close()
+                entry['shm'].unlink()
+            self.pending.clear()
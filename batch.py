@@ -0,0 +1,332 @@
+import os
+import sys
+import json
+import uuid
+import base64
+import sqlite3
+import argparse
+from datetime import datetime
+from vision import MAX_TOKENS, build_messages
+from prompt_presets import DEFAULT_ACTIVE, load_presets, resolve_presets, format_results
+from export_history import HISTORY_FILE, TIMESTAMP_FORMAT, iter_history, write_history
+
+# chatgpt-4o-latest isn't served by the Batch API, use the pinned model instead
+BATCH_MODEL = "gpt-4o"
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Batch API input limits per file
+MAX_REQUESTS_PER_SHARD = 50000
+MAX_BYTES_PER_SHARD = 200 * 1024 * 1024
+MANIFEST_FILE = 'manifest.json'
+# Answers ingested so far, kept next to the manifest until every preset of a source is in
+RESULTS_FILE = 'results.sqlite'
+IMAGE_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+# custom_id prefixes: history entries are matched by id, image files by path
+ENTRY_PREFIX = 'entry:'
+IMAGE_PREFIX = 'image:'
+PRESET_SEPARATOR = '|'
+
+
+def history_sources(history_path=HISTORY_FILE):
+    """Yield (source key, image path) for history entries whose screenshot still exists"""
+    for entry in iter_history(history_path):
+        image_path = entry.get("image_path")
+        if not image_path or not os.path.exists(image_path):
+            continue
+        if entry.get("id"):
+            yield ENTRY_PREFIX + entry["id"], image_path
+        else:
+            # Entries saved before ids existed can only be matched by their screenshot
+            yield IMAGE_PREFIX + image_path, image_path
+
+
+def folder_sources(folder):
+    """Yield (source key, image path) for every image in a folder"""
+    with os.scandir(folder) as it:
+        for item in it:
+            ext = os.path.splitext(item.name)[1].lower()
+            if item.is_file() and ext in IMAGE_TYPES:
+                yield IMAGE_PREFIX + item.path, item.path
+
+
+def build_request(custom_id, image_path, prompt, model=BATCH_MODEL):
+    """Return one Batch API request line for an image file, without re-encoding it"""
+    with open(image_path, 'rb') as f:
+        img_str = base64.b64encode(f.read()).decode()
+    mime_type = IMAGE_TYPES.get(os.path.splitext(image_path)[1].lower(), 'image/png')
+    request = {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": model,
+            "messages": build_messages(img_str, prompt, mime_type),
+            "max_tokens": MAX_TOKENS
+        }
+    }
+    return json.dumps(request, ensure_ascii=False) + "\n"
+
+
+class ShardWriter:
+    """Write request lines into numbered JSONL shards that stay within the Batch API limits"""
+    def __init__(self, out_dir, max_requests=MAX_REQUESTS_PER_SHARD, max_bytes=MAX_BYTES_PER_SHARD):
+        self.out_dir = out_dir
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.file = None
+        self.requests = 0
+        self.bytes = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def write(self, line):
+        data = line.encode('utf-8')
+        if len(data) > self.max_bytes:
+            raise ValueError(f"A single request is larger than the shard limit ({len(data)} bytes)")
+        if self.file is None or self.requests >= self.max_requests or self.bytes + len(data) > self.max_bytes:
+            self.next_shard()
+        self.file.write(data)
+        self.requests += 1
+        self.bytes += len(data)
+
+    def next_shard(self):
+        self.close()
+        path = os.path.join(self.out_dir, f"requests_{len(self.paths):03d}.jsonl")
+        self.paths.append(path)
+        self.file = open(path, 'wb')
+        self.requests = 0
+        self.bytes = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def build_batch(sources, presets, out_dir, model=BATCH_MODEL,
+                max_requests=MAX_REQUESTS_PER_SHARD, max_bytes=MAX_BYTES_PER_SHARD):
+    """Stream (source key, image path) pairs into request shards, one request per preset
+
+    Writes a manifest next to the shards with the presets used, which
+    ingest needs to put multi-preset answers back together. Returns the
+    number of requests written.
+    """
+    writer = ShardWriter(out_dir, max_requests, max_bytes)
+    count = 0
+    # Answers from an earlier batch in this directory don't belong to the new one
+    results_path = os.path.join(out_dir, RESULTS_FILE)
+    if os.path.exists(results_path):
+        os.remove(results_path)
+    try:
+        for source, image_path in sources:
+            for preset in presets:
+                custom_id = f"{source}{PRESET_SEPARATOR}{preset['name']}"
+                try:
+                    writer.write(build_request(custom_id, image_path, preset["prompt"], model))
+                except OSError as e:
+                    print(f"Skipping {image_path}: {e}")
+                    break
+                count += 1
+    finally:
+        writer.close()
+
+    manifest = {
+        "created": datetime.now().strftime(TIMESTAMP_FORMAT),
+        "model": model,
+        "presets": presets,
+        "shards": [os.path.basename(path) for path in writer.paths],
+        "requests": count
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return count
+
+
+def result_error(result):
+    """Return why a Batch API output line failed, or None if it holds an answer"""
+    if result.get("error"):
+        error = result["error"]
+        return error.get('message', error) if isinstance(error, dict) else error
+    response = result.get("response") or {}
+    if response.get("status_code") != 200:
+        body = response.get("body") or {}
+        return (body.get("error") or {}).get("message", f"status {response.get('status_code')}")
+    return None
+
+
+def response_text(result):
+    """Extract the answer from a successful Batch API output line"""
+    return result["response"]["body"]["choices"][0]["message"]["content"]
+
+
+def open_results(path):
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE IF NOT EXISTS results "
+               "(source TEXT, preset TEXT, text TEXT, PRIMARY KEY (source, preset))")
+    return db
+
+
+def index_results(output_paths, db, stats):
+    """Add the answers from Batch API output files to the results index
+
+    Failed lines are only counted, whatever the entry had before is kept
+    and the request can be retried in a later batch.
+    """
+    for path in output_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                stats["results"] += 1
+                error = result_error(result)
+                if error is not None:
+                    print(f"Skipping failed request {result.get('custom_id')}: {error}")
+                    stats["failed"] += 1
+                    continue
+                source, _, preset = result["custom_id"].rpartition(PRESET_SEPARATOR)
+                db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                           (source, preset, response_text(result)))
+    db.commit()
+
+
+def take_results(db, source, presets):
+    """Return {preset: text} for a source once every preset has an answer, and drop it from the index
+
+    Returns None while answers are missing, those stay indexed for a later ingest.
+    """
+    results = dict(db.execute("SELECT preset, text FROM results WHERE source = ?", (source,)).fetchall())
+    if not results or any(preset["name"] not in results for preset in presets):
+        return None
+    db.execute("DELETE FROM results WHERE source = ?", (source,))
+    return results
+
+
+def combine(presets, results):
+    """Turn per-preset answers into the entry's response text, like a live capture would"""
+    if len(presets) == 1:
+        return results[presets[0]["name"]]
+    return format_results(presets, results)
+
+
+def merged_entries(history_path, db, presets, stats):
+    """Yield history entries with complete batch answers merged in, then entries for new images"""
+    if os.path.exists(history_path):
+        for entry in iter_history(history_path):
+            results = None
+            if entry.get("id"):
+                results = take_results(db, ENTRY_PREFIX + entry["id"], presets)
+            if results is None and entry.get("image_path"):
+                results = take_results(db, IMAGE_PREFIX + entry["image_path"], presets)
+            if results is not None:
+                entry["response"] = combine(presets, results)
+                stats["updated"] += 1
+            yield entry
+
+    # Images from a folder that aren't in the history yet become new entries
+    sources = db.execute("SELECT DISTINCT source FROM results WHERE source LIKE ? ORDER BY source",
+                         (IMAGE_PREFIX + '%',)).fetchall()
+    for (source,) in sources:
+        results = take_results(db, source, presets)
+        if results is None:
+            continue
+        image_path = source[len(IMAGE_PREFIX):]
+        try:
+            timestamp = datetime.fromtimestamp(os.path.getmtime(image_path)).strftime(TIMESTAMP_FORMAT)
+        except OSError:
+            timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+        stats["added"] += 1
+        yield {
+            "id": uuid.uuid4().hex,
+            "timestamp": timestamp,
+            "image_path": image_path,
+            "response": combine(presets, results)
+        }
+
+
+def ingest_batch(output_paths, manifest_path, history_path=HISTORY_FILE):
+    """Merge Batch API output files back into the history by custom_id
+
+    Answers are indexed in an SQLite file next to the manifest and the
+    history is streamed through it, so memory use doesn't grow with either
+    side. An entry's response is only replaced once every preset in the
+    manifest has a successful answer; partial answers stay in the index, so
+    output files can be ingested in separate runs. Returns counts of
+    results, failed lines, updated and added entries, and sources still
+    waiting for answers.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        presets = json.load(f)["presets"]
+
+    stats = {"results": 0, "failed": 0, "updated": 0, "added": 0, "waiting": 0}
+    db = open_results(os.path.join(os.path.dirname(manifest_path), RESULTS_FILE))
+    try:
+        index_results(output_paths, db, stats)
+        try:
+            write_history(merged_entries(history_path, db, presets, stats), history_path)
+        except BaseException:
+            # The history wasn't replaced, keep the answers taken out for it
+            db.rollback()
+            raise
+        db.commit()
+        stats["waiting"] = db.execute("SELECT COUNT(DISTINCT source) FROM results").fetchone()[0]
+    finally:
+        db.close()
+    return stats
+
+
+def parse_size(value):
+    """Parse a byte size like 200MB or 1048576"""
+    units = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+    value = value.strip().upper()
+    for unit, factor in units.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare and ingest OpenAI Batch API jobs for SnipChat")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="Write Batch API request shards")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument('--history', nargs='?', const=HISTORY_FILE, help="Re-analyze screenshots from the history")
+    source.add_argument('--images', help="Analyze every image in a folder")
+    prompts = build.add_mutually_exclusive_group()
+    prompts.add_argument('--presets', help="Comma separated prompt presets (default: describe)")
+    prompts.add_argument('--prompt', help="A one-off prompt instead of presets")
+    build.add_argument('--out-dir', default='batch', help="Directory for the shards and manifest")
+    build.add_argument('--model', default=BATCH_MODEL)
+    build.add_argument('--max-requests', type=int, default=MAX_REQUESTS_PER_SHARD)
+    build.add_argument('--max-bytes', type=parse_size, default=MAX_BYTES_PER_SHARD)
+
+    ingest = commands.add_parser('ingest', help="Merge Batch API output files into the history")
+    ingest.add_argument('outputs', nargs='+', help="Batch API output JSONL files")
+    ingest.add_argument('--manifest', default=os.path.join('batch', MANIFEST_FILE))
+    ingest.add_argument('--history', default=HISTORY_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        if args.prompt:
+            presets = [{"name": "custom", "label": "Response", "prompt": args.prompt}]
+        else:
+            names = args.presets.split(',') if args.presets else [DEFAULT_ACTIVE]
+            presets = resolve_presets(names, load_presets())
+        sources = history_sources(args.history) if args.history else folder_sources(args.images)
+        count = build_batch(sources, presets, args.out_dir, args.model, args.max_requests, args.max_bytes)
+        print(f"Wrote {count} requests to {args.out_dir}")
+    else:
+        stats = ingest_batch(args.outputs, args.manifest, args.history)
+        print(f"Read {stats['results']} results ({stats['failed']} failed): updated {stats['updated']} entries, "
+              f"added {stats['added']}, {stats['waiting']} still waiting for answers or a matching entry")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
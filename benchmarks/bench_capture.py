@@ -0,0 +1,65 @@
+"""Benchmark grab latency and throughput of each capture backend.
+
+Usage: python benchmarks/bench_capture.py [--rounds N] [--backend NAME ...]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from capture_backends import CAPTURE_BACKENDS
+
+
+def bench_grab(backend, region, rounds):
+    """Return per-grab latencies in seconds for a region"""
+    # Warm up so one-off allocations don't count
+    backend.grab(*region)
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        backend.grab(*region)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name, label, region, latencies):
+    mean = statistics.mean(latencies)
+    p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+    megabytes = region[2] * region[3] * 3 / 1e6
+    print(f"{name:8} {label:12} {region[2]:>5}x{region[3]:<5} "
+          f"mean {mean * 1000:8.2f} ms  p95 {p95 * 1000:8.2f} ms  "
+          f"{1 / mean:8.1f} grabs/s  {megabytes / mean:8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--backend', action='append', choices=list(CAPTURE_BACKENDS),
+                        help="Backend to benchmark (default: all available)")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)  # noqa: F841 - the Qt backend needs an application
+    for name in args.backend or CAPTURE_BACKENDS:
+        try:
+            backend = CAPTURE_BACKENDS[name]()
+        except Exception as e:
+            print(f"{name:8} unavailable: {e}")
+            continue
+        try:
+            left, top, width, height = backend.virtual_geometry()
+            regions = [
+                ('full desktop', (left, top, width, height)),
+                ('small region', (left + width // 2 - 100, top + height // 2 - 100, 200, 200)),
+            ]
+            for label, region in regions:
+                report(name, label, region, bench_grab(backend, region, args.rounds))
+        finally:
+            backend.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark running several prompt presets against one capture.
+
+Compares encoding per prompt and asking one prompt after another with
+encoding once and running the presets concurrently. API calls go to a
+local stand-in server, or the real API with --live.
+Usage: python benchmarks/bench_fanout.py [--presets describe,ocr,summary,translate] [--latency 0.8]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_worker import FakeCompletionsHandler, start_server, make_capture
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--presets', default='describe,ocr,summary,translate')
+    parser.add_argument('--latency', type=float, default=0.8, help="Stand-in server response time in seconds")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--live', action='store_true', help="Use the real API from .env instead")
+    args = parser.parse_args()
+
+    if args.live:
+        from dotenv import load_dotenv
+        load_dotenv()
+    else:
+        FakeCompletionsHandler.delay = args.latency
+        start_server()
+
+    from openai import OpenAI
+    from vision import encode_image, request_analysis
+    from tiling import encode_payload
+    from prompt_presets import resolve_presets, run_presets
+
+    presets = resolve_presets(args.presets.split(','))
+    client = OpenAI()
+    image = make_capture(0)
+
+    sequential = []
+    concurrent = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        for preset in presets:
+            request_analysis(encode_image(image), preset["prompt"], client=client)
+        sequential.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        run_presets(encode_payload(image), presets, client=client)
+        concurrent.append(time.perf_counter() - start)
+
+    names = ', '.join(preset["name"] for preset in presets)
+    print(f"{len(presets)} presets ({names}), best of {args.rounds}:")
+    print(f"  one after another, encode per prompt  {min(sequential):6.2f} s")
+    print(f"  concurrent, shared encoded payload    {min(concurrent):6.2f} s")
+    print(f"  speedup                               {min(sequential) / min(concurrent):6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark hotkey-to-first-overlay-frame latency.
+
+Compares the old show path, which re-read the screen geometry, resized the
+overlay and forced a repaint on every hotkey press, with the pre-built
+overlay that shows with its cached geometry.
+Usage: QT_QPA_PLATFORM=offscreen python benchmarks/bench_overlay.py [--presses N]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QWidget
+from PyQt5.QtCore import QEventLoop
+
+
+def measure(app, overlay, show, presses):
+    """Press the hotkey presses times, return the first and the later latencies in ms"""
+    latencies = []
+    for _ in range(presses):
+        overlay.last_show_latency = None
+        show(time.perf_counter())
+        deadline = time.perf_counter() + 2
+        while overlay.last_show_latency is None and time.perf_counter() < deadline:
+            app.processEvents(QEventLoop.AllEvents, 5)
+        if overlay.last_show_latency is not None:
+            latencies.append(overlay.last_show_latency * 1000)
+        overlay.hide()
+        app.processEvents()
+    return latencies
+
+
+def report(label, latencies):
+    if not latencies:
+        print(f"{label:10} no frame painted")
+        return
+    later = latencies[1:] or latencies
+    print(f"{label:10} first {latencies[0]:7.2f} ms  then median {statistics.median(later):7.2f} ms  "
+          f"max {max(later):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--presses', type=int, default=20)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    from main import ScreenshotOverlay
+    from capture_backends import create_capture_backend
+
+    backend = create_capture_backend()
+
+    class OldOverlay(ScreenshotOverlay):
+        """The show path before the overlay was pre-built"""
+        def showFullScreen(self, requested_at=None):
+            self.requested_at = requested_at
+            self.reset_state()
+            self.update_geometry()
+            QWidget.showFullScreen(self)
+            self.raise_()
+            self.activateWindow()
+            self.repaint()
+
+    old = OldOverlay(backend)
+    report('old', measure(app, old, old.showFullScreen, args.presses))
+    old.close()
+
+    overlay = ScreenshotOverlay(backend)
+    report('prebuilt', measure(app, overlay, overlay.showFullScreen, args.presses))
+    overlay.close()
+    backend.close()
+
+
+if __name__ == '__main__':
+    main()
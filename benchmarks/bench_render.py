@@ -0,0 +1,93 @@
+"""Benchmark window resize cost for a long chat history.
+
+Compares the old word-wrapped QLabel responses with ResponseView.
+Usage: QT_QPA_PLATFORM=offscreen python benchmarks/bench_render.py [--entries N]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QScrollArea, QWidget, QVBoxLayout, QLabel
+from PyQt5.QtCore import Qt
+from response_view import ResponseView
+
+SAMPLE_RESPONSE = """The screenshot shows a **terminal** running a Python script.
+
+- The script prints a *traceback*
+- The error is a `KeyError` on line 42
+
+```python
+def lookup(table, key):
+    return table[key]
+```
+
+| Column | Value |
+|--------|-------|
+| status | failed |
+"""
+
+
+def build_window(entries, use_labels):
+    scroll = QScrollArea()
+    chat_widget = QWidget()
+    chat_layout = QVBoxLayout(chat_widget)
+    chat_layout.setSpacing(20)
+    chat_layout.setAlignment(Qt.AlignTop)
+    for i in range(entries):
+        text = f"Entry {i}\n\n{SAMPLE_RESPONSE}"
+        if use_labels:
+            widget = QLabel(text)
+            widget.setWordWrap(True)
+            widget.setStyleSheet("color: #FFFFFF; font-size: 13px; line-height: 1.5;")
+        else:
+            widget = ResponseView(text)
+        chat_layout.addWidget(widget)
+    scroll.setWidget(chat_widget)
+    scroll.setWidgetResizable(True)
+    scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+    return scroll
+
+
+def bench(app, entries, use_labels, widths):
+    start = time.perf_counter()
+    window = build_window(entries, use_labels)
+    window.resize(1000, 700)
+    window.show()
+    app.processEvents()
+    first_show = time.perf_counter() - start
+
+    timings = []
+    for width in widths:
+        start = time.perf_counter()
+        window.resize(width, 700)
+        app.processEvents()
+        timings.append(time.perf_counter() - start)
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return first_show, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--resizes', type=int, default=20)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    # Drag-resize style sequence, narrowing then widening again
+    widths = [1000 - 10 * i for i in range(args.resizes // 2)]
+    widths += list(reversed(widths))
+
+    for label, use_labels in (('QLabel', True), ('ResponseView', False)):
+        first_show, timings = bench(app, args.entries, use_labels, widths)
+        print(f"{label:13} {args.entries} entries: first show {first_show * 1000:9.1f} ms, "
+              f"resize mean {sum(timings) / len(timings) * 1000:8.1f} ms, "
+              f"max {max(timings) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark tiled against whole-image analysis of large, text-dense captures.
+
+Renders synthetic screenshots full of known words and reports latency and
+payload size for both approaches. Answer completeness (share of the known
+words found in the answer) needs the real API, pass --live for it.
+Usage: python benchmarks/bench_tiling.py [--width 5760] [--height 2160] [--live]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+from bench_worker import FakeCompletionsHandler, start_server
+
+WORDS = ("alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima mike november "
+         "oscar papa quebec romeo sierra tango uniform victor whiskey xray yankee zulu").split()
+PROMPT = "Transcribe all text visible in this image. Reply with the text only."
+
+
+def make_text_screenshot(width, height, seed=0, font_size=14):
+    """Render lines of random tagged words, return the image and the set of words drawn"""
+    rng = random.Random(seed)
+    image = Image.new('RGB', (width, height), (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", font_size)
+    except OSError:
+        font = ImageFont.load_default()
+    drawn = set()
+    line_height = font_size + 6
+    column_width = 480
+    for x in range(10, width - column_width + 1, column_width):
+        for y in range(10, height - line_height, line_height):
+            words = [f"{rng.choice(WORDS)}{rng.randint(10, 99)}" for _ in range(5)]
+            drawn.update(words)
+            draw.text((x, y), " ".join(words), fill=(220, 220, 220), font=font)
+    return image, drawn
+
+
+def completeness(answer, words):
+    found = sum(1 for word in words if word in answer)
+    return found / len(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=5760)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=1.0, help="Stand-in server base latency in seconds")
+    parser.add_argument('--seconds-per-mb', type=float, default=1.5,
+                        help="Stand-in server extra latency per request megabyte")
+    parser.add_argument('--live', action='store_true', help="Use the real API from .env instead")
+    args = parser.parse_args()
+
+    if args.live:
+        from dotenv import load_dotenv
+        load_dotenv()
+    else:
+        FakeCompletionsHandler.delay = args.latency
+        FakeCompletionsHandler.seconds_per_megabyte = args.seconds_per_mb
+        start_server()
+
+    from openai import OpenAI
+    from tiling import encode_payload, analyze_payload
+
+    client = OpenAI()
+    print(f"{args.width}x{args.height} text-dense capture, best of {args.rounds}:")
+    for label, mode in (('whole image', 'off'), ('tiled', 'on')):
+        best = None
+        scores = []
+        for seed in range(args.rounds):
+            image, words = make_text_screenshot(args.width, args.height, seed)
+            start = time.perf_counter()
+            payload = encode_payload(image, mode=mode)
+            answer = analyze_payload(payload, PROMPT, client=client)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            if args.live:
+                scores.append(completeness(answer, words))
+
+        megabytes = sum(len(tile["img_str"]) for tile in payload) / 1e6
+        score = f"{sum(scores) / len(scores) * 100:5.1f}% of words" if scores else "n/a (needs --live)"
+        print(f"  {label:12} {len(payload):3} request(s) + {'1 merge' if len(payload) > 1 else 'no merge'}, "
+              f"{megabytes:6.2f} MB base64, {best:6.2f} s, completeness {score}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Benchmark Qt event-loop latency during a burst of captures.
+
+Compares analysis on background threads in the app process with the
+out-of-process AnalysisWorker. API calls go to a local stand-in server.
+Usage: QT_QPA_PLATFORM=offscreen python benchmarks/bench_worker.py [--captures N]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer, QEventLoop
+
+TICK_MS = 5
+
+
+class FakeCompletionsHandler(BaseHTTPRequestHandler):
+    """Minimal chat completions endpoint that parses the request and answers after a delay"""
+    delay = 0.2
+    # Optional extra time per request megabyte, to model upload and image processing cost
+    seconds_per_megabyte = 0.0
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers['Content-Length']))
+        body = json.loads(raw)
+        time.sleep(self.delay + len(raw) / 1e6 * self.seconds_per_megabyte)
+        payload = json.dumps({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "A benchmark image."},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeCompletionsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ['OPENAI_API_KEY'] = 'bench'
+    return server
+
+
+def make_capture(seed):
+    """A noisy full-HD frame, expensive to PNG-encode like a busy desktop"""
+    return Image.effect_noise((1920, 1080), 64 + seed).convert('RGB')
+
+
+def measure(app, submit_burst, wait_done):
+    """Run a burst and return event-loop tick delays in ms"""
+    delays = []
+    last = [time.perf_counter()]
+
+    def tick():
+        now = time.perf_counter()
+        delays.append(max(0.0, (now - last[0]) * 1000 - TICK_MS))
+        last[0] = now
+
+    timer = QTimer()
+    timer.timeout.connect(tick)
+    timer.start(TICK_MS)
+    last[0] = time.perf_counter()
+    start = time.perf_counter()
+    submit_burst()
+    while not wait_done():
+        app.processEvents(QEventLoop.AllEvents, 10)
+    elapsed = time.perf_counter() - start
+    timer.stop()
+    return delays, elapsed
+
+
+def report(label, delays, elapsed):
+    ordered = sorted(delays)
+    p99 = ordered[max(0, int(len(ordered) * 0.99) - 1)]
+    print(f"{label:8} loop delay mean {statistics.mean(delays):7.2f} ms  p99 {p99:7.2f} ms  "
+          f"max {max(delays):7.2f} ms  burst done in {elapsed:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--captures', type=int, default=8)
+    args = parser.parse_args()
+
+    start_server()
+    app = QApplication(sys.argv)
+    from main import SignalManager
+    from vision import encode_image, request_analysis
+    from analysis_worker import AnalysisWorker
+    from openai import OpenAI
+
+    captures = [make_capture(i) for i in range(args.captures)]
+    out_dir = tempfile.mkdtemp(prefix='snipchat-bench-')
+
+    # Threads in the app process, sharing the GIL with the event loop
+    done = []
+    client = OpenAI()
+
+    def analyze(image, path):
+        image.save(path, 'PNG')
+        done.append(request_analysis(encode_image(image), client=client))
+
+    def thread_burst():
+        for i, image in enumerate(captures):
+            path = os.path.join(out_dir, f'thread_{i}.png')
+            threading.Thread(target=analyze, args=(image, path), daemon=True).start()
+
+    report('thread', *measure(app, thread_burst, lambda: len(done) == len(captures)))
+
+    # Worker process fed through shared memory
+    signal_manager = SignalManager()
+    results = []
+    signal_manager.screenshot_taken.connect(lambda text, path: results.append(text))
+    worker = AnalysisWorker(signal_manager)
+    worker.start()
+    worker.submit(Image.new('RGB', (8, 8)), os.path.join(out_dir, 'warmup.png'))
+    while not results:
+        app.processEvents(QEventLoop.AllEvents, 10)
+    results.clear()
+
+    def process_burst():
+        for i, image in enumerate(captures):
+            worker.submit(image, os.path.join(out_dir, f'process_{i}.png'))
+
+    report('process', *measure(app, process_burst, lambda: len(results) == len(captures)))
+    worker.stop()
+
+
+if __name__ == '__main__':
+    main()
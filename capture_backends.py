@@ -0,0 +1,419 @@
+import os
+import sys
+import ctypes
+import ctypes.util
+import threading
+from PIL import Image
+
+try:
+    import win32con
+    import win32api
+except ImportError:
+    win32con = None
+    win32api = None
+
+
+class CaptureError(Exception):
+    """Raised when a capture backend can't be initialised or fails to grab"""
+
+
+class CaptureBackend:
+    """Base class for screen capture backends
+
+    A backend reports the virtual desktop geometry (all monitors combined)
+    and grabs regions of it, given in the same global coordinates, as PIL images.
+    """
+    name = None
+
+    def virtual_geometry(self):
+        """Return (left, top, width, height) of the virtual desktop"""
+        raise NotImplementedError
+
+    def grab(self, left, top, width, height):
+        """Grab a region of the virtual desktop and return it as an RGB PIL image"""
+        raise NotImplementedError
+
+    def register_hotkey(self, callback):
+        """Call callback from a background thread whenever Ctrl+Shift+9 is pressed"""
+        raise CaptureError(f"The {self.name} backend has no global hotkey support")
+
+    def close(self):
+        """Release any resources held by the backend"""
+        pass
+
+
+class QtCaptureBackend(CaptureBackend):
+    """Capture with QScreen.grabWindow, using Win32 metrics for geometry when available"""
+    name = 'qt'
+
+    def __init__(self):
+        from PyQt5.QtWidgets import QApplication
+        if QApplication.instance() is None:
+            raise CaptureError("The Qt backend needs a running QApplication")
+
+    @property
+    def screen(self):
+        """The current primary screen, looked up each time since monitors can be unplugged or swapped"""
+        from PyQt5.QtWidgets import QApplication
+        return QApplication.primaryScreen()
+
+    def virtual_geometry(self):
+        if win32api is not None:
+            try:
+                return (
+                    win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN),
+                    win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN),
+                    win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN),
+                    win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN),
+                )
+            except Exception as e:
+                print(f"Error reading virtual screen metrics: {e}")
+        rect = self.screen.virtualGeometry()
+        return rect.x(), rect.y(), rect.width(), rect.height()
+
+    def grab(self, left, top, width, height):
+        from PyQt5.QtGui import QImage
+        pixmap = self.screen.grabWindow(0, left, top, width, height)
+        if pixmap.isNull():
+            raise CaptureError("grabWindow returned an empty pixmap")
+        qimage = pixmap.toImage().convertToFormat(QImage.Format_RGB888)
+        data = qimage.constBits().asstring(qimage.bytesPerLine() * qimage.height())
+        return Image.frombuffer('RGB', (qimage.width(), qimage.height()), data,
+                                'raw', 'RGB', qimage.bytesPerLine(), 1)
+
+
+class XImage(ctypes.Structure):
+    """Leading fields of Xlib's XImage, enough to read back pixel data"""
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong),
+        ('green_mask', ctypes.c_ulong),
+        ('blue_mask', ctypes.c_ulong),
+    ]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+class XWindowAttributes(ctypes.Structure):
+    """Leading fields of Xlib's XWindowAttributes, the rest is padding"""
+    _fields_ = [
+        ('x', ctypes.c_int),
+        ('y', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('_rest', ctypes.c_byte * 256),
+    ]
+
+
+class XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('resourceid', ctypes.c_ulong),
+        ('serial', ctypes.c_ulong),
+        ('error_code', ctypes.c_ubyte),
+        ('request_code', ctypes.c_ubyte),
+        ('minor_code', ctypes.c_ubyte),
+    ]
+
+
+class XEvent(ctypes.Union):
+    """Xlib's XEvent, only the type is read"""
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('pad', ctypes.c_long * 24),
+    ]
+
+
+XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent))
+
+Z_PIXMAP = 2
+ALL_PLANES = ctypes.c_ulong(-1).value
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+KEY_PRESS = 2
+GRAB_MODE_ASYNC = 1
+SHIFT_MASK = 1 << 0
+LOCK_MASK = 1 << 1
+CONTROL_MASK = 1 << 2
+MOD2_MASK = 1 << 4  # Num Lock on most layouts
+HOTKEY_POLL_INTERVAL = 0.02
+
+
+class X11ShmCaptureBackend(CaptureBackend):
+    """Capture straight from the X server through the MIT-SHM extension
+
+    Talks to libX11/libXext with ctypes in the same way mss does, but copies
+    pixels through a shared memory segment with XShmGetImage instead of
+    XGetImage, so the server writes straight into our address space.
+    One segment large enough for the whole root window is attached up front
+    and reused by every grab.
+    """
+    name = 'x11shm'
+
+    def __init__(self, display=None):
+        if not sys.platform.startswith('linux') or not (display or os.environ.get('DISPLAY')):
+            raise CaptureError("X11 shared memory capture needs an X11 display")
+
+        self.xlib = self._load_library('X11')
+        self.xext = self._load_library('Xext')
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._declare_functions()
+
+        self._errors = []
+        self._hotkey_errors = []
+        self.display_name = display.encode() if display else None
+        self.display = None
+        self.shminfo = None
+        self._hotkey_display = None
+        self._hotkey_thread = None
+        self._hotkey_stop = threading.Event()
+        # The error handler is process-wide, close() puts the previous one back
+        # before our callback is freed
+        self._error_handler = XErrorHandler(self._on_x_error)
+        self._previous_error_handler = self.xlib.XSetErrorHandler(
+            ctypes.cast(self._error_handler, ctypes.c_void_p))
+        try:
+            self.display = self.xlib.XOpenDisplay(self.display_name)
+            if not self.display:
+                raise CaptureError("Could not open X display")
+            if not self.xext.XShmQueryExtension(self.display):
+                raise CaptureError("X server does not support the MIT-SHM extension")
+            screen = self.xlib.XDefaultScreen(self.display)
+            self.root = self.xlib.XDefaultRootWindow(self.display)
+            self.visual = self.xlib.XDefaultVisual(self.display, screen)
+            self.depth = self.xlib.XDefaultDepth(self.display, screen)
+            self._attach_segment()
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def _load_library(name):
+        path = ctypes.util.find_library(name)
+        if not path:
+            raise CaptureError(f"lib{name} not found")
+        return ctypes.CDLL(path)
+
+    def _declare_functions(self):
+        xlib, xext, libc = self.xlib, self.xext, self.libc
+        xlib.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+        xlib.XSetErrorHandler.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDefaultVisual.restype = ctypes.c_void_p
+        xlib.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XGetWindowAttributes.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                              ctypes.POINTER(XWindowAttributes)]
+        xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        xlib.XStringToKeysym.argtypes = [ctypes.c_char_p]
+        xlib.XStringToKeysym.restype = ctypes.c_ulong
+        xlib.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        xlib.XKeysymToKeycode.restype = ctypes.c_ubyte
+        xlib.XGrabKey.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_uint, ctypes.c_ulong,
+                                  ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        xlib.XPending.argtypes = [ctypes.c_void_p]
+        xlib.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(XEvent)]
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    def _on_x_error(self, display, event):
+        error = event.contents
+        errors = self._hotkey_errors if display and display == self._hotkey_display else self._errors
+        errors.append(f"X error {error.error_code} (request {error.request_code})")
+        return 0
+
+    def _check_errors(self, action):
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise CaptureError(f"{action} failed: {'; '.join(errors)}")
+
+    def _attach_segment(self):
+        """Create and attach a shared memory segment big enough for the root window"""
+        _, _, width, height = self.virtual_geometry()
+        size = width * height * 4
+
+        shmid = self.libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if shmid < 0:
+            raise CaptureError(f"shmget failed: {os.strerror(ctypes.get_errno())}")
+        shmaddr = self.libc.shmat(shmid, None, 0)
+        if shmaddr == ctypes.c_void_p(-1).value:
+            self.libc.shmctl(shmid, IPC_RMID, None)
+            raise CaptureError(f"shmat failed: {os.strerror(ctypes.get_errno())}")
+
+        self.shminfo = XShmSegmentInfo(shmseg=0, shmid=shmid, shmaddr=shmaddr, readOnly=0)
+        self.segment_size = size
+        attached = self.xext.XShmAttach(self.display, ctypes.byref(self.shminfo))
+        self.xlib.XSync(self.display, 0)
+        # Mark the segment for removal now, it stays alive until both sides detach
+        self.libc.shmctl(shmid, IPC_RMID, None)
+        if not attached:
+            self._errors.append("XShmAttach returned False")
+        self._check_errors("Attaching shared memory")
+
+    def virtual_geometry(self):
+        attrs = XWindowAttributes()
+        self.xlib.XGetWindowAttributes(self.display, self.root, ctypes.byref(attrs))
+        # The X11 root window always starts at 0,0 and spans every monitor
+        return 0, 0, attrs.width, attrs.height
+
+    def grab(self, left, top, width, height):
+        if width * height * 4 > self.segment_size:
+            # The screen layout grew since we attached, start over with a bigger segment
+            self._detach_segment()
+            self._attach_segment()
+
+        ximage = self.xext.XShmCreateImage(self.display, self.visual, self.depth, Z_PIXMAP,
+                                           self.shminfo.shmaddr, ctypes.byref(self.shminfo),
+                                           width, height)
+        if not ximage:
+            raise CaptureError("XShmCreateImage failed")
+        try:
+            ok = self.xext.XShmGetImage(self.display, self.root, ximage, left, top, ALL_PLANES)
+            if not ok:
+                self._errors.append("XShmGetImage returned False")
+            self._check_errors("Grabbing the screen")
+            image = ximage.contents
+            if image.bits_per_pixel != 32:
+                raise CaptureError(f"Unsupported X11 pixel depth: {image.bits_per_pixel} bpp")
+            data = ctypes.string_at(image.data, image.bytes_per_line * height)
+            return Image.frombuffer('RGB', (width, height), data, 'raw', 'BGRX',
+                                    image.bytes_per_line, 1)
+        finally:
+            # Only the header is ours to free, the pixel data lives in the segment
+            self.xlib.XFree(ximage)
+
+    def register_hotkey(self, callback, key='9', modifiers=CONTROL_MASK | SHIFT_MASK):
+        """Grab Ctrl+Shift+9 on the root window, no root privileges needed
+
+        The grab lives on its own display connection, which a background
+        thread polls for key presses so Xlib is never used from two threads
+        on the same connection.
+        """
+        if self._hotkey_display:
+            raise CaptureError("The hotkey is already registered")
+        display = self.xlib.XOpenDisplay(self.display_name)
+        if not display:
+            raise CaptureError("Could not open X display for the hotkey")
+        self._hotkey_display = display
+        root = self.xlib.XDefaultRootWindow(display)
+        keycode = self.xlib.XKeysymToKeycode(display, self.xlib.XStringToKeysym(key.encode()))
+        # X treats Caps Lock and Num Lock as modifiers, grab every combination of them
+        for locks in (0, LOCK_MASK, MOD2_MASK, LOCK_MASK | MOD2_MASK):
+            self.xlib.XGrabKey(display, keycode, modifiers | locks, root, 1, GRAB_MODE_ASYNC, GRAB_MODE_ASYNC)
+        self.xlib.XSync(display, 0)
+        if self._hotkey_errors:
+            # Usually BadAccess, another client already grabbed the key
+            errors, self._hotkey_errors = self._hotkey_errors, []
+            self.xlib.XCloseDisplay(display)
+            self._hotkey_display = None
+            raise CaptureError(f"Grabbing the hotkey failed: {'; '.join(errors)}")
+
+        self._hotkey_stop.clear()
+        self._hotkey_thread = threading.Thread(target=self._poll_hotkey, args=(callback,), daemon=True)
+        self._hotkey_thread.start()
+
+    def _poll_hotkey(self, callback):
+        event = XEvent()
+        while not self._hotkey_stop.is_set():
+            while self.xlib.XPending(self._hotkey_display):
+                self.xlib.XNextEvent(self._hotkey_display, ctypes.byref(event))
+                if event.type == KEY_PRESS:
+                    callback()
+            self._hotkey_stop.wait(HOTKEY_POLL_INTERVAL)
+
+    def _release_hotkey(self):
+        if not self._hotkey_display:
+            return
+        self._hotkey_stop.set()
+        if self._hotkey_thread is not None:
+            self._hotkey_thread.join()
+            self._hotkey_thread = None
+        # Closing the connection drops its grabs
+        self.xlib.XCloseDisplay(self._hotkey_display)
+        self._hotkey_display = None
+
+    def _detach_segment(self):
+        if self.shminfo is None:
+            return
+        self.xext.XShmDetach(self.display, ctypes.byref(self.shminfo))
+        self.xlib.XSync(self.display, 0)
+        self.libc.shmdt(self.shminfo.shmaddr)
+        self.shminfo = None
+
+    def close(self):
+        self._release_hotkey()
+        if self.display:
+            self._detach_segment()
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+        if self._error_handler is not None:
+            self.xlib.XSetErrorHandler(self._previous_error_handler)
+            self._error_handler = None
+
+
+CAPTURE_BACKENDS = {
+    QtCaptureBackend.name: QtCaptureBackend,
+    X11ShmCaptureBackend.name: X11ShmCaptureBackend,
+}
+
+
+def create_capture_backend(name=None):
+    """Create the requested capture backend, or the fastest one that works here
+
+    The name defaults to the SNIPCHAT_CAPTURE_BACKEND environment variable.
+    Without a name, X11 shared memory is tried first and Qt is the fallback.
+    """
+    name = name or os.getenv('SNIPCHAT_CAPTURE_BACKEND')
+    if name:
+        if name not in CAPTURE_BACKENDS:
+            raise CaptureError(f"Unknown capture backend '{name}', expected one of: "
+                               f"{', '.join(CAPTURE_BACKENDS)}")
+        return CAPTURE_BACKENDS[name]()
+
+    candidates = [QtCaptureBackend]
+    if sys.platform.startswith('linux'):
+        candidates.insert(0, X11ShmCaptureBackend)
+    for backend_class in candidates:
+        try:
+            return backend_class()
+        except Exception as e:
+            print(f"Capture backend '{backend_class.name}' unavailable: {e}")
+    raise CaptureError("No capture backend available")
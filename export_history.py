@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import base64
+import argparse
+import html
+from io import BytesIO
+from datetime import datetime
+from PIL import Image
+
+HISTORY_FILE = 'chat_history.json'
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+EXPORT_FORMATS = ('md', 'html', 'jsonl')
+THUMBNAIL_SIZE = (400, 300)
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def iter_history(path=HISTORY_FILE, chunk_size=READ_CHUNK_SIZE):
+    """Yield history entries one by one without loading the whole JSON array"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        started = False
+        while True:
+            # Skip whitespace and separators, refilling the buffer as needed
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buf):
+                more = f.read(chunk_size)
+                if not more:
+                    if started:
+                        raise ValueError(f"Unexpected end of history file: {path}")
+                    return
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError(f"History file is not a JSON array: {path}")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == ']':
+                return
+
+            try:
+                entry, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Entry spans the chunk boundary, read more and retry
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            yield entry
+            pos = end
+            # Drop consumed text so the buffer stays around one chunk in size
+            if pos > chunk_size:
+                buf = buf[pos:]
+                pos = 0
+
+
+def write_history(entries, path=HISTORY_FILE):
+    """Stream entries into a history file, replacing it atomically once complete
+
+    The output matches what the notepad saves (a JSON array indented by 2).
+    """
+    tmp_path = path + '.tmp'
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for entry in entries:
+            text = json.dumps(entry, ensure_ascii=False, indent=2)
+            f.write(',\n  ' if count else '\n  ')
+            f.write(text.replace('\n', '\n  '))
+            count += 1
+        f.write('\n]' if count else ']')
+    os.replace(tmp_path, path)
+    return count
+
+
+def parse_date(value, end_of_day=False):
+    """Parse a YYYY-MM-DD or full timestamp argument into a datetime"""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+    except ValueError:
+        day = datetime.strptime(value, "%Y-%m-%d")
+        if end_of_day:
+            return day.replace(hour=23, minute=59, second=59)
+        return day
+
+
+def filter_by_date(entries, since=None, until=None):
+    """Yield only entries whose timestamp lies within [since, until]"""
+    for entry in entries:
+        if since is None and until is None:
+            yield entry
+            continue
+        try:
+            dt = datetime.strptime(entry.get("timestamp") or "", TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        if since is not None and dt < since:
+            continue
+        if until is not None and dt > until:
+            continue
+        yield entry
+
+
+def make_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """Return a base64 JPEG thumbnail for an image, or None if it can't be read"""
+    if not image_path or not os.path.exists(image_path):
+        return None
+    try:
+        with Image.open(image_path) as image:
+            image.draft('RGB', size)
+            thumb = image.convert('RGB')
+            thumb.thumbnail(size)
+        buffered = BytesIO()
+        thumb.save(buffered, format="JPEG", quality=80)
+        return base64.b64encode(buffered.getvalue()).decode()
+    except Exception as e:
+        print(f"Error creating thumbnail for {image_path}: {e}")
+        return None
+
+
+class MarkdownWriter:
+    """Write history entries as a Markdown document"""
+    def __init__(self, out, thumbnails=False):
+        self.out = out
+        self.thumbnails = thumbnails
+
+    def begin(self):
+        self.out.write("# SnipChat History\n\n")
+
+    def write(self, entry):
+        self.out.write(f"## {entry.get('timestamp') or 'Unknown time'}\n\n")
+        image_path = entry.get("image_path")
+        if image_path:
+            thumb = make_thumbnail(image_path) if self.thumbnails else None
+            if thumb:
+                self.out.write(f"![screenshot](data:image/jpeg;base64,{thumb})\n\n")
+            else:
+                self.out.write(f"![screenshot]({image_path.replace(os.sep, '/')})\n\n")
+        if entry.get("response"):
+            self.out.write(f"{entry['response']}\n\n")
+        self.out.write("---\n\n")
+
+    def end(self):
+        pass
+
+
+class HtmlWriter:
+    """Write history entries as a single self-contained HTML page"""
+    def __init__(self, out, thumbnails=False):
+        self.out = out
+        self.thumbnails = thumbnails
+
+    def begin(self):
+        self.out.write(
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+            "<title>SnipChat History</title>\n<style>\n"
+            "body { background: #2D2D2D; color: #FFFFFF; font-family: sans-serif; margin: 20px; }\n"
+            ".entry { margin-bottom: 24px; border-bottom: 1px solid #3D3D3D; padding-bottom: 16px; }\n"
+            ".time { color: #888888; font-size: 11px; }\n"
+            ".image { color: #888888; font-size: 12px; }\n"
+            ".image img { border-radius: 15px; max-width: 400px; }\n"
+            ".response { font-size: 13px; line-height: 1.5; white-space: pre-wrap; }\n"
+            "</style>\n</head>\n<body>\n<h1>SnipChat History</h1>\n"
+        )
+
+    def write(self, entry):
+        self.out.write("<div class=\"entry\">\n")
+        self.out.write(f"<div class=\"time\">{html.escape(entry.get('timestamp') or '')}</div>\n")
+        image_path = entry.get("image_path")
+        if image_path:
+            thumb = make_thumbnail(image_path) if self.thumbnails else None
+            if thumb:
+                self.out.write(f"<div class=\"image\"><img src=\"data:image/jpeg;base64,{thumb}\" "
+                               f"alt=\"{html.escape(image_path)}\"></div>\n")
+            else:
+                self.out.write(f"<div class=\"image\">{html.escape(image_path)}</div>\n")
+        if entry.get("response"):
+            self.out.write(f"<div class=\"response\">{html.escape(entry['response'])}</div>\n")
+        self.out.write("</div>\n")
+
+    def end(self):
+        self.out.write("</body>\n</html>\n")
+
+
+class JsonlWriter:
+    """Write history entries as one JSON object per line"""
+    def __init__(self, out, thumbnails=False):
+        self.out = out
+        self.thumbnails = thumbnails
+
+    def begin(self):
+        pass
+
+    def write(self, entry):
+        if self.thumbnails and entry.get("image_path"):
+            entry = dict(entry, thumbnail=make_thumbnail(entry["image_path"]))
+        self.out.write(json.dumps(entry, ensure_ascii=False))
+        self.out.write("\n")
+
+    def end(self):
+        pass
+
+
+WRITERS = {
+    'md': MarkdownWriter,
+    'html': HtmlWriter,
+    'jsonl': JsonlWriter,
+}
+
+
+def format_from_path(path):
+    """Guess the export format from an output file extension"""
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext in ('markdown', 'md'):
+        return 'md'
+    if ext in ('htm', 'html'):
+        return 'html'
+    if ext in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    raise ValueError(f"Unknown export format for {path}, expected one of: {', '.join(EXPORT_FORMATS)}")
+
+
+def export_history(output_path, fmt=None, history_path=HISTORY_FILE,
+                   thumbnails=False, since=None, until=None):
+    """Stream history entries from history_path into output_path, returns the entry count"""
+    fmt = fmt or format_from_path(output_path)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    count = 0
+    with open(output_path, 'w', encoding='utf-8', newline='\n') as out:
+        writer = WRITERS[fmt](out, thumbnails=thumbnails)
+        writer.begin()
+        if os.path.exists(history_path):
+            for entry in filter_by_date(iter_history(history_path), since, until):
+                writer.write(entry)
+                count += 1
+        writer.end()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export SnipChat history to Markdown, HTML or JSONL")
+    parser.add_argument('output', help="Output file (.md, .html or .jsonl)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS,
+                        help="Export format (default: guessed from the output extension)")
+    parser.add_argument('--history', default=HISTORY_FILE, help="History file to read")
+    parser.add_argument('--thumbnails', action='store_true', help="Embed screenshot thumbnails")
+    parser.add_argument('--since', help="Only include entries at or after this date (YYYY-MM-DD)")
+    parser.add_argument('--until', help="Only include entries at or before this date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    try:
+        count = export_history(
+            args.output,
+            fmt=args.format,
+            history_path=args.history,
+            thumbnails=args.thumbnails,
+            since=parse_date(args.since),
+            until=parse_date(args.until, end_of_day=True),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Exported {count} entries to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,41 @@
 import sys
 import os
-import base64
-from io import BytesIO
+import time
+import uuid
+import shutil
+import tempfile
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
-from PIL import Image, ImageGrab
-from openai import OpenAI
-import win32gui
-import win32con
-import win32api
+from PIL import ImageGrab
 from PyQt5.QtWidgets import (QApplication, QSystemTrayIcon, QMenu, QMainWindow,
-                           QTextEdit, QVBoxLayout, QWidget, QMessageBox, QShortcut, QHBoxLayout, QPushButton, QScrollArea, QLabel)
-from PyQt5.QtGui import QIcon, QPainter, QColor, QScreen, QPen, QKeySequence, QPixmap
-from PyQt5.QtCore import Qt, QRect, QPoint, pyqtSignal, QObject, QTimer
+                           QTextEdit, QVBoxLayout, QWidget, QMessageBox, QShortcut, QHBoxLayout, QPushButton, QScrollArea, QLabel,
+                           QFileDialog, QDialog, QDialogButtonBox, QFormLayout, QCheckBox, QDateEdit)
+from PyQt5.QtGui import QIcon, QPainter, QColor, QScreen, QPen, QKeySequence, QPixmap, QGuiApplication
+from PyQt5.QtCore import Qt, QRect, QPoint, pyqtSignal, QObject, QTimer, QDate
 import json
+from export_history import HISTORY_FILE, export_history, format_from_path, parse_date, write_history
+from capture_backends import create_capture_backend
+from response_view import ResponseView
+from vision import RETRYABLE_ERRORS
+from tiling import encode_payload, analyze_payload, should_tile
+from analysis_worker import AnalysisWorker
+from offline_queue import OfflineQueue
+from prompt_presets import (load_presets, active_preset_names, resolve_presets,
+                            format_results, run_presets)
+
+try:
+    import win32gui
+    import win32con
+except ImportError:
+    # Not on Windows, hotkeys go through an X11 key grab or the keyboard module
+    win32gui = None
+    win32con = None
+
+try:
+    import keyboard
+except ImportError:
+    keyboard = None
 
 # Load environment variables
 load_dotenv()
@@ -22,11 +44,18 @@ class SignalManager(QObject):
     """Class to manage custom signals for communication between components"""
     screenshot_taken = pyqtSignal(str, str)  # Signal emitted when a new response is received
     take_screenshot = pyqtSignal()  # Signal to trigger screenshot
+    capture_queued = pyqtSignal(str, str, str)  # Entry id, screenshot path, status text for a capture still waiting for answers
+    response_updated = pyqtSignal(str, str)  # Entry id and the response that replaces its text
 
 class ScreenshotOverlay(QWidget):
     """Widget for selecting screen region with crosshair"""
-    def __init__(self, parent=None):
+    def __init__(self, capture_backend, analysis_worker=None, offline_queue=None, parent=None):
         super().__init__(parent)
+        self.capture_backend = capture_backend
+        self.analysis_worker = analysis_worker
+        self.offline_queue = offline_queue
+        # Prompt presets asked about every capture, several run concurrently
+        self.presets = resolve_presets(active_preset_names())
         # Set window flags for proper multi-monitor support
         self.setWindowFlags(
             Qt.FramelessWindowHint |
@@ -39,19 +68,38 @@ class ScreenshotOverlay(QWidget):
         self.setAttribute(Qt.WA_NoSystemBackground)
         self.setCursor(Qt.CrossCursor)
         
+        # Hotkey time of the pending show, cleared once its first frame is painted
+        self.requested_at = None
+        self.last_show_latency = None
+        self.log_latency = os.getenv('SNIPCHAT_LOG_LATENCY', '').lower() in ('1', 'true', 'yes')
+
         # Initialize screen info
         self.screen = QApplication.primaryScreen()
         self.update_geometry()
         self.reset_state()
 
+        # Keep the cached geometry current, screen changes tend to arrive in bursts
+        self.geometry_timer = QTimer(self)
+        self.geometry_timer.setSingleShot(True)
+        self.geometry_timer.setInterval(100)
+        self.geometry_timer.timeout.connect(self.update_geometry)
+        app = QGuiApplication.instance()
+        app.screenAdded.connect(self.watch_screen)
+        app.screenAdded.connect(self.schedule_geometry_update)
+        app.screenRemoved.connect(self.schedule_geometry_update)
+        app.primaryScreenChanged.connect(self.schedule_geometry_update)
+        for screen in app.screens():
+            self.watch_screen(screen)
+
+        # Create the native window up front so the first show doesn't pay for it
+        self.ensurePolished()
+        self.winId()
+
     def update_geometry(self):
-        """Update the overlay geometry to cover all screens using Win32 API"""
+        """Update the overlay geometry to cover all screens as reported by the capture backend"""
         try:
             # Get the virtual screen metrics
-            left = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
-            top = win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN)
-            width = win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN)
-            height = win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN)
+            left, top, width, height = self.capture_backend.virtual_geometry()
             
             # Create a rect that covers all monitors
             self.virtual_geometry = QRect(left, top, width, height)
@@ -59,10 +107,18 @@ class ScreenshotOverlay(QWidget):
             
         except Exception as e:
             print(f"Error updating geometry: {e}")
-            # Fallback to primary screen if Win32 API fails
+            # Fallback to primary screen if the backend fails
             self.virtual_geometry = self.screen.geometry()
             self.setGeometry(self.virtual_geometry)
 
+    def watch_screen(self, screen):
+        """Refresh the cached geometry when a screen is moved or resized"""
+        screen.geometryChanged.connect(self.schedule_geometry_update)
+
+    def schedule_geometry_update(self, *args):
+        self.screen = QApplication.primaryScreen()
+        self.geometry_timer.start()
+
     def reset_state(self):
         """Reset the overlay state"""
         self.start_point = QPoint()
@@ -70,17 +126,25 @@ class ScreenshotOverlay(QWidget):
         self.is_drawing = False
         self.capture_ready = False
 
-    def showFullScreen(self):
-        """Override to ensure proper full screen on all monitors"""
+    def showFullScreen(self, requested_at=None):
+        """Show the pre-built overlay on all monitors using the cached geometry"""
+        self.requested_at = requested_at if requested_at is not None else time.perf_counter()
         self.reset_state()
-        self.update_geometry()
+        if self.geometry_timer.isActive():
+            # A screen change is still pending, apply it before showing
+            self.geometry_timer.stop()
+            self.update_geometry()
         super().showFullScreen()
         self.raise_()
         self.activateWindow()
-        # Force a repaint
-        self.repaint()
 
     def paintEvent(self, event):
+        if self.requested_at is not None:
+            # First frame since the hotkey
+            self.last_show_latency = time.perf_counter() - self.requested_at
+            self.requested_at = None
+            if self.log_latency:
+                print(f"Hotkey to overlay: {self.last_show_latency * 1000:.1f} ms")
         painter = QPainter(self)
         painter.setPen(QColor(255, 255, 255))
         
@@ -149,74 +213,135 @@ class ScreenshotOverlay(QWidget):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             screenshot_path = os.path.join('screenshots', f'screenshot_{timestamp}.png')
             
-            # Take the screenshot using the screen's grabWindow method
-            screenshot = self.screen.grabWindow(
-                0,  # Window ID (0 for entire screen)
-                x1, y1,  # Already in global coordinates
-                x2 - x1,
-                y2 - y1
-            )
-            
-            if screenshot.save(screenshot_path, 'PNG'):
-                # Reset capture ready flag
-                self.capture_ready = False
-                # Open with PIL for analysis
-                with Image.open(screenshot_path) as image:
-                    image_copy = image.copy()
-                self.analyze_image(image_copy, screenshot_path)
-            else:
-                signal_manager.screenshot_taken.emit("Error: Failed to save screenshot", None)
+            # Take the screenshot with the capture backend (already in global coordinates)
+            image = self.capture_backend.grab(x1, y1, x2 - x1, y2 - y1)
+            # Reset capture ready flag
+            self.capture_ready = False
+            if self.analysis_worker is not None and self.analysis_worker.available():
+                # The worker process saves the PNG and does the API call
+                self.analysis_worker.submit(image, screenshot_path, self.presets)
+                return
+            image.save(screenshot_path, 'PNG')
+            if self.offline_queue is not None and self.offline_queue.is_offline():
+                # No point waiting on a request that will fail, go straight to the queue
+                self.queue_capture(screenshot_path, "the API is unreachable")
+                return
+            if len(self.presets) > 1:
+                self.analyze_presets(image, screenshot_path)
+                return
+            self.analyze_image(image, screenshot_path)
         except Exception as e:
             print(f"Screenshot error: {e}")
             signal_manager.screenshot_taken.emit(f"Error capturing screenshot: {str(e)}", None)
 
     def analyze_image(self, image, screenshot_path):
         """Send the image to GPT-4 Vision API for analysis"""
+        if should_tile(image.size):
+            # Tiled captures take a request per tile plus a merge, keep them off the Qt thread
+            threading.Thread(target=self.run_analysis, args=(image, screenshot_path), daemon=True).start()
+            return None
+        return self.run_analysis(image, screenshot_path)
+
+    def run_analysis(self, image, screenshot_path):
+        """Analyze the capture and emit the response, or queue it if the API can't be reached"""
         try:
-            # Convert PIL Image to base64
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-
-            client = OpenAI()
-            response = client.chat.completions.create(
-                model="chatgpt-4o-latest",  # Using the latest GPT-4 with vision alias
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that analyzes images clearly and concisely."
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "What's in this image? Describe it clearly but briefly."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{img_str}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=300
-            )
-            
-            response_text = response.choices[0].message.content
+            # Convert PIL Image to base64, split into tiles if it's too large to read in one piece
+            payload = encode_payload(image)
+            response_text = analyze_payload(payload, self.presets[0]["prompt"])
             signal_manager.screenshot_taken.emit(response_text, screenshot_path)
             return response_text
+        except RETRYABLE_ERRORS as e:
+            if self.offline_queue is None:
+                error_msg = f"Error analyzing image: {str(e)}"
+                signal_manager.screenshot_taken.emit(error_msg, None)
+                return error_msg
+            return self.queue_capture(screenshot_path, str(e))
         except Exception as e:
             error_msg = f"Error analyzing image: {str(e)}"
             signal_manager.screenshot_taken.emit(error_msg, None)
             return error_msg
 
+    def analyze_presets(self, image, screenshot_path):
+        """Run every active preset against the capture, filling in one chat entry as answers arrive"""
+        presets = self.presets
+        entry_id = uuid.uuid4().hex
+        signal_manager.capture_queued.emit(entry_id, screenshot_path, format_results(presets, {}))
+
+        def run():
+            results = {}
+
+            def on_result(name, text):
+                results[name] = text
+                signal_manager.response_updated.emit(entry_id, format_results(presets, results))
+
+            try:
+                # Encoded once, every request shares the same payload
+                payload = encode_payload(image)
+                run_presets(payload, presets, on_result)
+            except RETRYABLE_ERRORS as e:
+                if self.offline_queue is None:
+                    return
+                self.offline_queue.enqueue(screenshot_path, presets, entry_id)
+                signal_manager.response_updated.emit(
+                    entry_id, f"Queued for analysis, it will be retried automatically ({str(e)})"
+                )
+            except Exception as e:
+                signal_manager.response_updated.emit(entry_id, f"Error analyzing image: {str(e)}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def queue_capture(self, screenshot_path, reason):
+        """Save a capture to the offline queue and show it with a placeholder response"""
+        status = f"Queued for analysis, it will be retried automatically ({reason})"
+        entry_id = self.offline_queue.enqueue(screenshot_path, self.presets)
+        signal_manager.capture_queued.emit(entry_id, screenshot_path, status)
+        return status
+
+class ExportOptionsDialog(QDialog):
+    """Dialog for picking the date range and thumbnail option of an export"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Export Chat')
+        layout = QFormLayout(self)
+
+        self.thumbnails_check = QCheckBox("Embed screenshot thumbnails (slower)")
+        layout.addRow(self.thumbnails_check)
+
+        # Each bound is optional, its date field is only used when checked
+        today = QDate.currentDate()
+        self.since_check = QCheckBox("From")
+        self.since_edit = QDateEdit(today.addMonths(-1))
+        self.until_check = QCheckBox("Until")
+        self.until_edit = QDateEdit(today)
+        for check, edit in ((self.since_check, self.since_edit), (self.until_check, self.until_edit)):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+            edit.setEnabled(False)
+            check.toggled.connect(edit.setEnabled)
+            layout.addRow(check, edit)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def options(self):
+        """Return the chosen options as export_history keyword arguments"""
+        since = until = None
+        if self.since_check.isChecked():
+            since = parse_date(self.since_edit.date().toString("yyyy-MM-dd"))
+        if self.until_check.isChecked():
+            until = parse_date(self.until_edit.date().toString("yyyy-MM-dd"), end_of_day=True)
+        return {"thumbnails": self.thumbnails_check.isChecked(), "since": since, "until": until}
+
 class NotepadWindow(QMainWindow):
     """Window for displaying API responses in a chat-like interface"""
+    export_finished = pyqtSignal(bool, str)  # Success flag and message of a background export
+
     def __init__(self):
         super().__init__()
+        self.entries = {}  # Entry id -> message widget
+        self.export_finished.connect(self.show_export_result)
         self.init_ui()
         self.load_responses()
         self.apply_styles()
@@ -303,11 +428,17 @@ class NotepadWindow(QMainWindow):
         button_layout = QHBoxLayout(button_container)
         button_layout.setContentsMargins(20, 10, 20, 10)
         
+        # Create export button
+        self.export_button = QPushButton("Export")
+        self.export_button.setObjectName("exportButton")
+        self.export_button.clicked.connect(self.export_responses)
+
         # Create clear button
         self.clear_button = QPushButton("Clear Chat")
         self.clear_button.setObjectName("clearButton")
         self.clear_button.clicked.connect(self.clear_responses)
         button_layout.addStretch()
+        button_layout.addWidget(self.export_button)
         button_layout.addWidget(self.clear_button)
         
         layout.addWidget(button_container)
@@ -400,7 +531,7 @@ class NotepadWindow(QMainWindow):
                 border-bottom: 2px solid #4D4D4D;
                 border-bottom-right-radius: 2px;
             }
-            #clearButton {
+            #clearButton, #exportButton {
                 background-color: #1E1E1E;
                 color: white;
                 border: none;
@@ -408,14 +539,21 @@ class NotepadWindow(QMainWindow):
                 border-radius: 5px;
                 font-size: 12px;
             }
-            #clearButton:hover {
+            #clearButton:hover, #exportButton:hover {
                 background-color: #3D3D3D;
             }
         """)
 
-    def create_message_widget(self, timestamp, image_path, response_text):
+    def create_message_widget(self, timestamp, image_path, response_text, entry_id=None):
         """Create a widget for a single chat message"""
         message_widget = QWidget()
+        # Keep the raw entry data on the widget so it can be saved back as-is
+        entry_id = entry_id or uuid.uuid4().hex
+        self.entries[entry_id] = message_widget
+        message_widget.setProperty("entry_id", entry_id)
+        message_widget.setProperty("timestamp", timestamp)
+        message_widget.setProperty("image_path", image_path)
+        message_widget.setProperty("response", response_text)
         message_layout = QVBoxLayout(message_widget)
         message_layout.setSpacing(24)
         message_layout.setContentsMargins(0, 0, 0, 0)
@@ -500,27 +638,40 @@ class NotepadWindow(QMainWindow):
             assistant_label.setStyleSheet("color: #888888; font-size: 12px; margin-bottom: 5px;")
             assistant_layout.addWidget(assistant_label)
             
-            # Add response text
-            response_label = QLabel(response_text)
-            response_label.setWordWrap(True)
-            response_label.setStyleSheet("color: #FFFFFF; font-size: 13px; line-height: 1.5;")
-            assistant_layout.addWidget(response_label)
+            # Add response text, rendered as Markdown with highlighted code blocks
+            response_view = ResponseView(response_text)
+            assistant_layout.addWidget(response_view)
             
             message_layout.addWidget(assistant_container)
 
         return message_widget
 
-    def add_response(self, response, image_path=None):
+    def add_response(self, response, image_path=None, entry_id=None):
         """Add a new response to the chat"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # Create and add message widget
-        message_widget = self.create_message_widget(timestamp, image_path, response)
+        message_widget = self.create_message_widget(timestamp, image_path, response, entry_id)
         self.chat_layout.addWidget(message_widget)
         
         # Save the response
         self.save_responses()
 
+    def update_response(self, entry_id, response):
+        """Replace the response of an existing message, e.g. when a queued capture is analyzed"""
+        message_widget = self.entries.get(entry_id)
+        if message_widget is None:
+            # The message was cleared while the capture was queued
+            return
+
+        old_view = message_widget.findChild(ResponseView)
+        if old_view is not None:
+            new_view = ResponseView(response)
+            old_view.parentWidget().layout().replaceWidget(old_view, new_view)
+            old_view.deleteLater()
+        message_widget.setProperty("response", response)
+        self.save_responses()
+
     def save_responses(self):
         """Save responses to a file"""
         history = []
@@ -529,31 +680,22 @@ class NotepadWindow(QMainWindow):
         for i in range(self.chat_layout.count()):
             widget = self.chat_layout.itemAt(i).widget()
             if widget:
-                # Find the timestamp, image, and response labels
-                timestamp = None
-                image_path = None
-                response_text = None
-                
-                for child in widget.findChildren(QLabel):
-                    if child.styleSheet().startswith("color: #888888; font-size: 10px;"):
-                        timestamp = child.text()
-                    elif isinstance(child.pixmap(), QPixmap):
-                        # Get the original image path from the widget's property
-                        image_path = child.property("original_path")
-                    elif child.styleSheet().startswith("color: #FFFFFF; font-size: 13px;"):
-                        response_text = child.text()
+                entry_id = widget.property("entry_id")
+                timestamp = widget.property("timestamp")
+                image_path = widget.property("image_path")
+                response_text = widget.property("response")
                 
                 if timestamp and (image_path or response_text):
                     history.append({
+                        "id": entry_id,
                         "timestamp": timestamp,
                         "image_path": image_path,
                         "response": response_text
                     })
         
-        # Save history to a JSON file
+        # Save history to a JSON file, replaced atomically so readers never see it half written
         try:
-            with open('chat_history.json', 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+            write_history(history, HISTORY_FILE)
         except Exception as e:
             print(f"Error saving chat history: {e}")
 
@@ -568,6 +710,7 @@ class NotepadWindow(QMainWindow):
             
             # Recreate each message
             for msg in history:
+                entry_id = msg.get("id")
                 timestamp = msg.get("timestamp")
                 image_path = msg.get("image_path")
                 response = msg.get("response")
@@ -578,12 +721,61 @@ class NotepadWindow(QMainWindow):
                     image_path = None
                 
                 # Create and add message widget
-                message_widget = self.create_message_widget(timestamp, image_path, response)
+                message_widget = self.create_message_widget(timestamp, image_path, response, entry_id)
                 self.chat_layout.addWidget(message_widget)
                 
         except Exception as e:
             print(f"Error loading chat history: {e}")
 
+    def export_responses(self):
+        """Export the chat history to Markdown, HTML or JSONL"""
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            'Export Chat',
+            'chat_history.md',
+            'Markdown (*.md);;HTML (*.html);;JSON Lines (*.jsonl)'
+        )
+        if not path:
+            return
+
+        dialog = ExportOptionsDialog(self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        options = dialog.options()
+
+        # Export from a snapshot, new responses keep replacing the history file meanwhile
+        fd, snapshot_path = tempfile.mkstemp(suffix='.json', prefix='snipchat-export-')
+        os.close(fd)
+        try:
+            shutil.copyfile(HISTORY_FILE, snapshot_path)
+        except FileNotFoundError:
+            pass
+
+        # Large histories with thumbnails take a while, keep the window responsive
+        self.export_button.setEnabled(False)
+        self.export_button.setText("Exporting...")
+
+        def run():
+            try:
+                count = export_history(path, fmt=format_from_path(path), history_path=snapshot_path, **options)
+                self.export_finished.emit(True, f'Exported {count} messages to {path}')
+            except Exception as e:
+                print(f"Error exporting chat history: {e}")
+                self.export_finished.emit(False, f'Export failed: {str(e)}')
+            finally:
+                os.remove(snapshot_path)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def show_export_result(self, success, message):
+        """Runs on the Qt thread once a background export is done"""
+        self.export_button.setEnabled(True)
+        self.export_button.setText("Export")
+        if success:
+            QMessageBox.information(self, 'Export Chat', message)
+        else:
+            QMessageBox.warning(self, 'Export Chat', message)
+
     def clear_responses(self):
         """Clear all responses"""
         reply = QMessageBox.question(
@@ -596,6 +788,7 @@ class NotepadWindow(QMainWindow):
         
         if reply == QMessageBox.Yes:
             # Clear all messages
+            self.entries.clear()
             while self.chat_layout.count():
                 child = self.chat_layout.takeAt(0)
                 if child.widget():
@@ -706,12 +899,29 @@ class SystemTrayApp:
         self.app.setQuitOnLastWindowClosed(False)
         
         self.notepad = NotepadWindow()
-        self.screenshot_overlay = ScreenshotOverlay()
+        self.capture_backend = create_capture_backend()
+        self.offline_queue = OfflineQueue(
+            signal_manager,
+            concurrency=int(os.getenv('SNIPCHAT_QUEUE_CONCURRENCY', '4'))
+        )
+        self.analysis_worker = None
+        if os.getenv('SNIPCHAT_WORKER_PROCESS', '').lower() in ('1', 'true', 'yes'):
+            self.analysis_worker = AnalysisWorker(signal_manager, self.offline_queue)
+            self.analysis_worker.start()
+        self.screenshot_overlay = ScreenshotOverlay(self.capture_backend, self.analysis_worker,
+                                                    self.offline_queue)
         self.setup_tray()
+        self.hotkey_hwnd = None
+        self.hotkey_time = None
         self.register_hotkey()
         
         # Connect signals
         signal_manager.screenshot_taken.connect(self.handle_screenshot_response)
+        signal_manager.take_screenshot.connect(self.take_screenshot)
+        signal_manager.capture_queued.connect(self.handle_capture_queued)
+        signal_manager.response_updated.connect(self.notepad.update_response)
+        # Drain captures left over from earlier sessions once the notepad knows their entries
+        self.offline_queue.start()
         self._notepad_show_connection = None
 
     def setup_tray(self):
@@ -728,6 +938,17 @@ class SystemTrayApp:
         self.screenshot_action = self.menu.addAction("Take Screenshot")
         self.screenshot_action.triggered.connect(self.take_screenshot)
         
+        # Add prompt preset toggles
+        self.prompts_menu = self.menu.addMenu("Prompts")
+        active = [preset["name"] for preset in self.screenshot_overlay.presets]
+        self.preset_actions = {}
+        for name, preset in load_presets().items():
+            action = self.prompts_menu.addAction(preset["label"])
+            action.setCheckable(True)
+            action.setChecked(name in active)
+            action.toggled.connect(self.update_presets)
+            self.preset_actions[name] = action
+        
         self.menu.addSeparator()
         
         # Add notepad action
@@ -744,17 +965,36 @@ class SystemTrayApp:
         self.tray.activated.connect(self.tray_activated)
         self.tray.show()
 
+    def update_presets(self, checked=False):
+        """Use the presets checked in the tray menu for the next captures"""
+        names = [name for name, action in self.preset_actions.items() if action.isChecked()]
+        self.screenshot_overlay.presets = resolve_presets(names)
+        if not names:
+            # Always keep at least one preset, resolve_presets falls back to the default
+            fallback = self.preset_actions.get(self.screenshot_overlay.presets[0]["name"])
+            if fallback is not None:
+                fallback.setChecked(True)
+
     def tray_activated(self, reason):
         """Handle tray icon activation"""
         if reason == QSystemTrayIcon.Trigger:  # Single left click
             self.show_notepad()
 
     def register_hotkey(self):
-        """Register global hotkey using Windows API"""
+        """Register the global hotkey with the Windows API, an X11 key grab, or the keyboard module as a fallback"""
+        if win32gui is None:
+            try:
+                # X11 key grab through the capture backend, works without root
+                self.capture_backend.register_hotkey(self.hotkey_pressed)
+            except Exception as e:
+                print(f"Backend hotkey unavailable, trying the keyboard module: {e}")
+                self.register_keyboard_hotkey()
+            return
+
         def handle_win_event(hwnd, msg, wparam, lparam):
             if msg == win32con.WM_HOTKEY:
                 if wparam == 1:  # Our hotkey identifier
-                    self.take_screenshot()
+                    self.hotkey_pressed()
             return True
 
         # Register the hotkey handler
@@ -795,8 +1035,25 @@ class SystemTrayApp:
         except Exception as e:
             print(f"Failed to register hotkey: {e}")
 
+    def register_keyboard_hotkey(self):
+        """Register Ctrl+Shift+9 through the keyboard module (needs root on Linux)"""
+        if keyboard is None:
+            print("Failed to register hotkey: keyboard module not installed")
+            return
+        try:
+            # The callback runs on the keyboard thread, the signal hands it to the Qt thread
+            keyboard.add_hotkey('ctrl+shift+9', self.hotkey_pressed)
+        except Exception as e:
+            print(f"Failed to register hotkey: {e}")
+
+    def hotkey_pressed(self):
+        """Note when the hotkey was pressed for the overlay latency, then ask for a screenshot"""
+        self.hotkey_time = time.perf_counter()
+        signal_manager.take_screenshot.emit()
+
     def take_screenshot(self):
         """Show the screenshot overlay"""
+        requested_at, self.hotkey_time = self.hotkey_time, None
         if not self.screenshot_overlay.isVisible():
             # Disconnect any existing connection
             if hasattr(self, '_notepad_show_connection') and self._notepad_show_connection is not None:
@@ -813,7 +1070,7 @@ class SystemTrayApp:
 
             # Reset overlay and show
             self.screenshot_overlay.reset_state()
-            self.screenshot_overlay.showFullScreen()
+            self.screenshot_overlay.showFullScreen(requested_at)
 
     def handle_screenshot_response(self, response, screenshot_path):
         """Handle the response from GPT-4 Vision API"""
@@ -821,6 +1078,12 @@ class SystemTrayApp:
         self.notepad.show()
         self.notepad.activateWindow()
 
+    def handle_capture_queued(self, entry_id, screenshot_path, status):
+        """Show a capture waiting in the offline queue, its response is filled in later"""
+        self.notepad.add_response(status, screenshot_path, entry_id)
+        self.notepad.show()
+        self.notepad.activateWindow()
+
     def show_notepad(self):
         """Show the notepad window"""
         self.notepad.show()
@@ -829,10 +1092,17 @@ class SystemTrayApp:
     def quit_app(self):
         """Clean up and quit the application"""
         try:
-            win32gui.UnregisterHotKey(self.hotkey_hwnd, 1)
-            win32gui.DestroyWindow(self.hotkey_hwnd)
+            if self.hotkey_hwnd is not None:
+                win32gui.UnregisterHotKey(self.hotkey_hwnd, 1)
+                win32gui.DestroyWindow(self.hotkey_hwnd)
+            elif keyboard is not None:
+                keyboard.unhook_all_hotkeys()
         except:
             pass
+        if self.analysis_worker is not None:
+            self.analysis_worker.stop()
+        self.offline_queue.stop()
+        self.capture_backend.close()
         self.notepad.close()
         self.screenshot_overlay.close()
         self.tray.hide()
@@ -0,0 +1,198 @@
+import os
+import json
+import uuid
+import time
+import socket
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from PIL import Image
+from openai import OpenAI, APIConnectionError
+from PyQt5.QtCore import QObject, pyqtSignal
+from vision import RETRYABLE_ERRORS
+from tiling import encode_payload
+from prompt_presets import DEFAULT_ACTIVE, resolve_presets, analyze_with_presets
+
+QUEUE_DIR = 'offline_queue'
+DEFAULT_CONCURRENCY = 4
+INITIAL_BACKOFF = 2.0
+MAX_BACKOFF = 60.0
+PROBE_TIMEOUT = 3.0
+REQUEST_TIMEOUT = 60.0
+# Server-side failures (rate limits, 5xx) a single capture may hit before it gets an error response
+MAX_JOB_ATTEMPTS = 5
+
+
+class OfflineQueue(QObject):
+    """Durable on-disk queue of captures waiting for the API
+
+    Each capture is one JSON file in QUEUE_DIR, written atomically, so the
+    queue survives restarts and crashes. A background thread drains it with
+    at most `concurrency` requests in flight whenever the API host is
+    reachable, backing off while it isn't. Only connection failures take the
+    whole queue offline; a capture that keeps failing on the server side is
+    retried MAX_JOB_ATTEMPTS times and then answered with the error. Results
+    are delivered on the Qt thread through SignalManager.response_updated,
+    keyed by chat entry id.
+    """
+    result_ready = pyqtSignal(str, str)
+
+    def __init__(self, signal_manager, queue_dir=QUEUE_DIR, concurrency=DEFAULT_CONCURRENCY):
+        super().__init__()
+        self.signal_manager = signal_manager
+        self.queue_dir = queue_dir
+        self.concurrency = max(1, concurrency)
+        self.wakeup = threading.Event()
+        self.offline = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self._client = None
+        self.result_ready.connect(self.deliver_result)
+        os.makedirs(self.queue_dir, exist_ok=True)
+
+    def start(self):
+        """Start draining in the background, including anything left from earlier runs"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+
+    def is_offline(self):
+        """True while the last attempt to reach the API failed"""
+        return self.offline.is_set()
+
+    def enqueue(self, screenshot_path, presets=None, entry_id=None):
+        """Persist a capture for later analysis and return the chat entry id it belongs to"""
+        entry_id = entry_id or uuid.uuid4().hex
+        job = {
+            "entry_id": entry_id,
+            "screenshot_path": screenshot_path,
+            "presets": presets or resolve_presets([DEFAULT_ACTIVE]),
+            "queued_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "attempts": 0,
+        }
+        # Nanosecond prefix keeps the directory listing in submission order
+        name = f"{time.time_ns()}_{entry_id}.json"
+        self.write_job(os.path.join(self.queue_dir, name), job)
+        self.wakeup.set()
+        return entry_id
+
+    def write_job(self, job_path, job):
+        """Write a job file atomically, so a crash never leaves a half-written one"""
+        tmp_path = job_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, job_path)
+
+    def pending_jobs(self):
+        """Return queued job file paths, oldest first"""
+        try:
+            names = sorted(n for n in os.listdir(self.queue_dir) if n.endswith('.json'))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.queue_dir, n) for n in names]
+
+    def run(self):
+        backoff = INITIAL_BACKOFF
+        while not self.stopping:
+            if not self.pending_jobs():
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+
+            retry_later = False
+            if self.endpoint_reachable():
+                self.offline.clear()
+                retry_later = self.drain()
+            else:
+                self.offline.set()
+
+            if self.offline.is_set() or retry_later:
+                # Sleep, but wake up early if stopped
+                self.wakeup.wait(backoff)
+                self.wakeup.clear()
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            else:
+                backoff = INITIAL_BACKOFF
+
+    def endpoint_reachable(self):
+        """Cheap TCP check that the API host accepts connections"""
+        url = urlparse(str(self.client().base_url))
+        port = url.port or (443 if url.scheme == 'https' else 80)
+        try:
+            with socket.create_connection((url.hostname, port), timeout=PROBE_TIMEOUT):
+                return True
+        except OSError:
+            return False
+
+    def client(self):
+        """Shared API client, created on first use in the drain thread"""
+        if self._client is None:
+            self._client = OpenAI(timeout=REQUEST_TIMEOUT)
+        return self._client
+
+    def drain(self):
+        """Process queued jobs with bounded concurrency until empty or offline
+
+        Returns True if any job failed on the server side and was kept for a later retry.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = set()
+            for job_path in self.pending_jobs():
+                if self.stopping or self.offline.is_set():
+                    break
+                if len(in_flight) >= self.concurrency:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                in_flight.add(pool.submit(self.process_job, job_path))
+            done, _ = wait(in_flight)
+        return any(future.result() for future in done)
+
+    def process_job(self, job_path):
+        """Analyze one queued capture, returns True if it was kept to retry later"""
+        if self.offline.is_set():
+            return False
+        try:
+            with open(job_path, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Dropping unreadable queue entry {job_path}: {e}")
+            self.remove_job(job_path)
+            return False
+
+        try:
+            with Image.open(job["screenshot_path"]) as image:
+                payload = encode_payload(image)
+            presets = job.get("presets") or resolve_presets([DEFAULT_ACTIVE])
+            text = analyze_with_presets(payload, presets, client=self.client())
+        except APIConnectionError as e:
+            # Keep the job, the whole queue waits for connectivity to come back
+            print(f"Queued analysis failed, will retry: {e}")
+            self.offline.set()
+            return False
+        except RETRYABLE_ERRORS as e:
+            # The API is up but this request failed, retry it a few times on its own
+            job["attempts"] = job.get("attempts", 0) + 1
+            if job["attempts"] < MAX_JOB_ATTEMPTS:
+                print(f"Queued analysis failed (attempt {job['attempts']}), will retry: {e}")
+                self.write_job(job_path, job)
+                return True
+            text = f"Error analyzing image: {str(e)}"
+        except Exception as e:
+            text = f"Error analyzing image: {str(e)}"
+
+        self.remove_job(job_path)
+        self.result_ready.emit(job["entry_id"], text)
+        return False
+
+    def remove_job(self, job_path):
+        try:
+            os.remove(job_path)
+        except FileNotFoundError:
+            pass
+
+    def deliver_result(self, entry_id, text):
+        """Runs on the Qt thread: hand the result to whoever shows the entry"""
+        self.signal_manager.response_updated.emit(entry_id, text)
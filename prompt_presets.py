@@ -0,0 +1,120 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from openai import OpenAI
+from vision import DEFAULT_PROMPT, RETRYABLE_ERRORS
+from tiling import analyze_payload
+
+PRESETS_FILE = 'prompt_presets.json'
+DEFAULT_ACTIVE = 'describe'
+WAITING_TEXT = "_Waiting for answer..._"
+
+DEFAULT_PRESETS = {
+    "describe": {
+        "label": "Description",
+        "prompt": DEFAULT_PROMPT
+    },
+    "ocr": {
+        "label": "Text (OCR)",
+        "prompt": "Transcribe all text visible in this image exactly as written. "
+                  "Keep the line breaks and layout where it matters. Reply with the text only."
+    },
+    "summary": {
+        "label": "Summary",
+        "prompt": "Summarize the content of this image in two or three sentences."
+    },
+    "translate": {
+        "label": "Translation",
+        "prompt": "Translate all text visible in this image into English. Reply with the translation only."
+    },
+}
+
+
+def load_presets(path=PRESETS_FILE):
+    """Return all presets as {name: {"label", "prompt"}}, with presets from path overriding the defaults
+
+    The file holds a JSON object in the same shape as DEFAULT_PRESETS.
+    """
+    presets = {name: dict(preset) for name, preset in DEFAULT_PRESETS.items()}
+    if not os.path.exists(path):
+        return presets
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            custom = json.load(f)
+        for name, preset in custom.items():
+            presets[name] = {
+                "label": preset.get("label", name),
+                "prompt": preset["prompt"]
+            }
+    except Exception as e:
+        print(f"Error loading prompt presets: {e}")
+    return presets
+
+
+def active_preset_names():
+    """Names of the presets to run per capture, from SNIPCHAT_PROMPTS (comma separated)"""
+    names = os.getenv('SNIPCHAT_PROMPTS', DEFAULT_ACTIVE)
+    return [name.strip() for name in names.split(',') if name.strip()]
+
+
+def resolve_presets(names, presets=None):
+    """Turn preset names into a list of {"name", "label", "prompt"} dicts, skipping unknown names"""
+    presets = presets if presets is not None else load_presets()
+    resolved = []
+    for name in names:
+        if name not in presets:
+            print(f"Unknown prompt preset: {name}")
+            continue
+        resolved.append(dict(presets[name], name=name))
+    return resolved or [dict(presets[DEFAULT_ACTIVE], name=DEFAULT_ACTIVE)]
+
+
+def format_results(presets, results):
+    """Combine preset answers into one response, in preset order, with placeholders for pending ones"""
+    sections = []
+    for preset in presets:
+        text = results.get(preset["name"], WAITING_TEXT)
+        sections.append(f"### {preset['label']}\n\n{text}")
+    return "\n\n".join(sections)
+
+
+def run_presets(payload, presets, on_result=None, client=None):
+    """Ask every preset about one encoded capture concurrently and return {name: text}
+
+    The payload from tiling.encode_payload is shared by all requests. on_result(name, text) is
+    called from the calling thread as each answer arrives. Failures show up
+    as error text for that preset, unless every preset failed for a
+    retryable reason, in which case the first such error is raised so the
+    capture can be queued as a whole.
+    """
+    client = client or OpenAI()
+    results = {}
+    retryable = []
+    with ThreadPoolExecutor(max_workers=len(presets)) as pool:
+        futures = {
+            pool.submit(analyze_payload, payload, preset["prompt"], client): preset["name"]
+            for preset in presets
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                text = future.result()
+            except RETRYABLE_ERRORS as e:
+                retryable.append(e)
+                text = f"Error analyzing image: {str(e)}"
+            except Exception as e:
+                text = f"Error analyzing image: {str(e)}"
+            results[name] = text
+            if on_result is not None:
+                on_result(name, text)
+    if retryable and len(retryable) == len(presets):
+        raise retryable[0]
+    return results
+
+
+def analyze_with_presets(payload, presets, on_result=None, client=None):
+    """Return the response for a capture: the plain answer for one preset, combined sections for several"""
+    if len(presets) == 1:
+        return analyze_payload(payload, presets[0]["prompt"], client=client)
+    results = run_presets(payload, presets, on_result, client)
+    return format_results(presets, results)
@@ -0,0 +1,170 @@
+import re
+import html
+import math
+from functools import lru_cache
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtGui import (QTextDocument, QPainter, QPalette, QColor, QFont, QFontMetrics,
+                         QTextCursor, QTextBlockFormat, QAbstractTextDocumentLayout)
+from PyQt5.QtCore import QSize, QRectF
+
+try:
+    from pygments import highlight
+    from pygments.lexers import get_lexer_by_name, guess_lexer
+    from pygments.formatters import HtmlFormatter
+    from pygments.util import ClassNotFound
+except ImportError:
+    highlight = None
+
+FENCE_PATTERN = re.compile(r'^```[ \t]*([\w+#.-]*)[^\n]*\n(.*?)^```[ \t]*$', re.MULTILINE | re.DOTALL)
+CODE_STYLE = "monokai"
+CODE_BACKGROUND = "#1E1E1E"
+TEXT_COLOR = "#FFFFFF"
+FONT_PIXEL_SIZE = 13
+LINE_HEIGHT_PERCENT = 150
+# Widths we remember exact heights for, per message
+HEIGHT_CACHE_SIZE = 8
+
+
+def highlight_code(code, language=None):
+    """Return an HTML block for a code snippet, syntax highlighted when Pygments is available"""
+    if highlight is not None:
+        try:
+            lexer = get_lexer_by_name(language) if language else guess_lexer(code)
+        except ClassNotFound:
+            lexer = None
+        if lexer is not None:
+            # Inline styles, Qt's rich text engine doesn't support stylesheets with classes
+            formatter = HtmlFormatter(style=CODE_STYLE, noclasses=True, nowrap=True)
+            body = highlight(code, lexer, formatter)
+            return (f'<pre style="background-color: {CODE_BACKGROUND}; '
+                    f'font-family: Consolas, monospace;">{body}</pre>')
+    return (f'<pre style="background-color: {CODE_BACKGROUND}; '
+            f'font-family: Consolas, monospace;">{html.escape(code)}</pre>')
+
+
+def markdown_to_html(text):
+    """Convert a Markdown fragment to an HTML body using Qt's Markdown importer"""
+    document = QTextDocument()
+    document.setMarkdown(text)
+    full = document.toHtml()
+    start = full.find('<body')
+    start = full.find('>', start) + 1
+    end = full.rfind('</body>')
+    return full[start:end]
+
+
+@lru_cache(maxsize=1024)
+def render_response_html(text):
+    """Render a model response (Markdown with fenced code blocks) to Qt rich text HTML"""
+    parts = []
+    pos = 0
+    for match in FENCE_PATTERN.finditer(text):
+        if match.start() > pos:
+            parts.append(markdown_to_html(text[pos:match.start()]))
+        parts.append(highlight_code(match.group(2), match.group(1) or None))
+        pos = match.end()
+    if pos < len(text):
+        parts.append(markdown_to_html(text[pos:]))
+    return ''.join(parts)
+
+
+class ResponseView(QWidget):
+    """Rich text view for a single response with cached, lazily computed layout
+
+    The parsed document is built once per message and exact heights are
+    remembered per width. Only visible entries get laid out: heightForWidth
+    answers from the cache or an estimate, and the exact layout happens in
+    paintEvent, which Qt only delivers to entries inside the viewport.
+    """
+    def __init__(self, text, parent=None):
+        super().__init__(parent)
+        self.text = text
+        self.document = None
+        self.layout_width = None
+        self.heights = {}
+
+        font = QFont(self.font())
+        font.setPixelSize(FONT_PIXEL_SIZE)
+        self.setFont(font)
+        metrics = QFontMetrics(font)
+        self.line_spacing = math.ceil(metrics.lineSpacing() * LINE_HEIGHT_PERCENT / 100)
+        self.char_width = max(metrics.averageCharWidth(), 1)
+        self.line_lengths = [len(line) for line in text.split('\n')]
+
+        policy = QSizePolicy(QSizePolicy.Preferred, QSizePolicy.Minimum)
+        policy.setHeightForWidth(True)
+        self.setSizePolicy(policy)
+
+    def ensure_document(self):
+        """Parse the response into a document on first use"""
+        if self.document is not None:
+            return self.document
+        document = QTextDocument(self)
+        document.setDefaultFont(self.font())
+        document.setDocumentMargin(0)
+        document.setHtml(render_response_html(self.text))
+        # Apply the line height to every block, Qt ignores it when set on the body
+        cursor = QTextCursor(document)
+        cursor.select(QTextCursor.Document)
+        block_format = QTextBlockFormat()
+        block_format.setLineHeight(LINE_HEIGHT_PERCENT, QTextBlockFormat.ProportionalHeight)
+        cursor.mergeBlockFormat(block_format)
+        self.document = document
+        return document
+
+    def exact_height(self, width):
+        """Lay the document out at width and return its height, cached per width"""
+        if width in self.heights:
+            return self.heights[width]
+        document = self.ensure_document()
+        document.setTextWidth(width)
+        self.layout_width = width
+        height = math.ceil(document.size().height())
+        if len(self.heights) >= HEIGHT_CACHE_SIZE:
+            self.heights.pop(next(iter(self.heights)))
+        self.heights[width] = height
+        return height
+
+    def estimated_height(self, width):
+        """Guess the height at width without laying the document out"""
+        if self.heights:
+            # Wrapped text keeps roughly the same area, scale the closest known height
+            known_width = min(self.heights, key=lambda w: abs(w - width))
+            return max(self.line_spacing, round(self.heights[known_width] * known_width / max(width, 1)))
+        chars_per_line = max(width // self.char_width, 1)
+        rows = sum(max(1, math.ceil(length / chars_per_line)) for length in self.line_lengths)
+        return rows * self.line_spacing
+
+    def hasHeightForWidth(self):
+        return True
+
+    def heightForWidth(self, width):
+        if width in self.heights:
+            return self.heights[width]
+        return self.estimated_height(width)
+
+    def sizeHint(self):
+        width = self.width() if self.width() > 0 else 400
+        return QSize(width, self.heightForWidth(width))
+
+    def minimumSizeHint(self):
+        return QSize(0, self.line_spacing)
+
+    def paintEvent(self, event):
+        width = self.width()
+        height = self.exact_height(width)
+        if self.layout_width != width:
+            # Cached height from an earlier layout, the document itself needs this width again
+            self.document.setTextWidth(width)
+            self.layout_width = width
+        if height != self.height():
+            # The estimate was off, let the layout give us the exact size
+            self.updateGeometry()
+
+        painter = QPainter(self)
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette.setColor(QPalette.Text, QColor(TEXT_COLOR))
+        context.clip = QRectF(event.rect())
+        painter.setClipRect(event.rect())
+        self.document.documentLayout().draw(painter, context)
+        painter.end()
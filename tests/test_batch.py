@@ -0,0 +1,124 @@
+import os
+import json
+import shutil
+
+import pytest
+
+from batch import (MANIFEST_FILE, build_batch, build_request, folder_sources, history_sources,
+                   ingest_batch)
+from export_history import iter_history
+from prompt_presets import WAITING_TEXT, resolve_presets
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'batch')
+PRESETS = resolve_presets(['describe', 'ocr'])
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A copy of the fixtures as the working directory, history image paths are relative to it"""
+    path = tmp_path / 'work'
+    shutil.copytree(FIXTURES, path)
+    monkeypatch.chdir(path)
+    return path
+
+
+def read_shards(out_dir):
+    with open(os.path.join(out_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    shards = []
+    for name in manifest["shards"]:
+        with open(os.path.join(out_dir, name), encoding='utf-8') as f:
+            shards.append([json.loads(line)["custom_id"] for line in f])
+    return manifest, shards
+
+
+def responses():
+    return {entry["image_path"]: entry["response"] for entry in iter_history('history.json')}
+
+
+def build(presets=PRESETS):
+    sources = list(history_sources('history.json')) + list(folder_sources('images'))
+    build_batch(sources, presets, 'batch')
+    return os.path.join('batch', MANIFEST_FILE)
+
+
+def test_custom_ids_match_entries_by_id_and_by_image_path(workdir):
+    assert list(history_sources('history.json')) == [
+        ('entry:e1', 'images/a.png'),
+        ('image:images/b.png', 'images/b.png'),
+    ]
+    assert sorted(folder_sources('images')) == [
+        ('image:images/a.png', 'images/a.png'),
+        ('image:images/b.png', 'images/b.png'),
+        ('image:images/c.png', 'images/c.png'),
+    ]
+
+
+def test_shards_roll_over_on_max_requests(workdir):
+    sources = sorted(folder_sources('images'))
+    count = build_batch(sources, PRESETS, 'batch', max_requests=4)
+
+    manifest, shards = read_shards('batch')
+    assert count == manifest["requests"] == 6
+    assert [len(shard) for shard in shards] == [4, 2]
+    assert shards[0][:2] == ['image:images/a.png|describe', 'image:images/a.png|ocr']
+
+
+def test_shards_roll_over_on_max_bytes(workdir):
+    sources = sorted(folder_sources('images'))
+    line_size = len(build_request('image:images/a.png|describe', 'images/a.png',
+                                  PRESETS[0]["prompt"]).encode('utf-8'))
+    build_batch(sources, PRESETS[:1], 'batch', max_bytes=line_size * 2 - 1)
+
+    _, shards = read_shards('batch')
+    assert [len(shard) for shard in shards] == [1, 1, 1]
+    for name in os.listdir('batch'):
+        if name.endswith('.jsonl'):
+            assert os.path.getsize(os.path.join('batch', name)) < line_size * 2
+
+
+def test_request_larger_than_a_shard_is_rejected(workdir):
+    with pytest.raises(ValueError):
+        build_batch(folder_sources('images'), PRESETS, 'batch', max_bytes=100)
+
+
+def test_ingest_updates_matching_entries_and_appends_folder_images(workdir):
+    manifest_path = build()
+    stats = ingest_batch(['output_complete.jsonl'], manifest_path, 'history.json')
+
+    assert stats == {"results": 6, "failed": 0, "updated": 2, "added": 1, "waiting": 0}
+    history = list(iter_history('history.json'))
+    assert [entry["image_path"] for entry in history] == ['images/a.png', 'images/b.png', 'images/c.png']
+    assert history[0]["id"] == 'e1'
+    assert "new a description" in history[0]["response"] and "new a text" in history[0]["response"]
+    assert "new b description" in history[1]["response"] and "new b text" in history[1]["response"]
+    assert "new c description" in history[2]["response"] and "new c text" in history[2]["response"]
+    assert history[2]["id"]
+
+
+def test_single_preset_answer_replaces_the_response_as_is(workdir):
+    manifest_path = build(PRESETS[:1])
+    with open('output_complete.jsonl', encoding='utf-8') as src, open('describe.jsonl', 'w', encoding='utf-8') as dst:
+        dst.writelines(line for line in src if '|describe' in line)
+    ingest_batch(['describe.jsonl'], manifest_path, 'history.json')
+
+    assert responses()['images/a.png'] == 'new a description'
+
+
+def test_failed_and_partial_answers_never_touch_the_history(workdir):
+    manifest_path = build()
+
+    # e1 has one good answer and one expired request, b.png only its describe answer
+    stats = ingest_batch(['output_partial_1.jsonl'], manifest_path, 'history.json')
+    assert stats == {"results": 3, "failed": 1, "updated": 0, "added": 0, "waiting": 2}
+    assert responses() == {'images/a.png': 'old a', 'images/b.png': 'old b'}
+
+    # A later run brings e1's missing answer, b.png's ocr request failed on the server
+    stats = ingest_batch(['output_partial_2.jsonl'], manifest_path, 'history.json')
+    assert stats == {"results": 2, "failed": 1, "updated": 1, "added": 0, "waiting": 1}
+    current = responses()
+    assert "new a description" in current['images/a.png'] and "new a text" in current['images/a.png']
+    assert current['images/b.png'] == 'old b'
+    for text in current.values():
+        assert WAITING_TEXT not in text
+        assert "Error analyzing image" not in text
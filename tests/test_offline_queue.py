@@ -0,0 +1,164 @@
+import io
+import json
+import time
+import base64
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+from openai import OpenAI
+from PIL import Image
+from PyQt5.QtCore import QCoreApplication, QObject, pyqtSignal
+
+import offline_queue
+from offline_queue import OfflineQueue
+
+JOBS = 50
+
+
+class Signals(QObject):
+    response_updated = pyqtSignal(str, str)
+
+
+class ColorCompletionsHandler(BaseHTTPRequestHandler):
+    """Stand-in chat completions endpoint that answers with the red value of the sent image"""
+    # Images with this red value always get a 500
+    failing_red = None
+    failures = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        image_url = next(part["image_url"]["url"] for part in body["messages"][-1]["content"]
+                         if part["type"] == "image_url")
+        png = base64.b64decode(image_url.split(',', 1)[1])
+        red = Image.open(io.BytesIO(png)).convert('RGB').getpixel((0, 0))[0]
+        if red == self.failing_red:
+            type(self).failures += 1
+            error = json.dumps({"error": {"message": "boom", "type": "server_error"}}).encode()
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(error)))
+            self.end_headers()
+            self.wfile.write(error)
+            return
+        payload = json.dumps({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"color {red}"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def closed_port(monkeypatch):
+    """A local port nothing listens on yet, with the API client pointed at it"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv('OPENAI_BASE_URL', f"http://127.0.0.1:{port}/v1")
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    return port
+
+
+def start_server(port, handler=ColorCompletionsHandler):
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_for(app, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+def test_jobs_wait_while_down_and_drain_when_up(app, closed_port, tmp_path):
+    signals = Signals()
+    responses = {}
+    signals.response_updated.connect(lambda entry_id, text: responses.__setitem__(entry_id, text))
+    queue = OfflineQueue(signals, queue_dir=str(tmp_path / 'queue'), concurrency=4)
+
+    expected = {}
+    for i in range(JOBS):
+        screenshot_path = str(tmp_path / f'capture_{i}.png')
+        Image.new('RGB', (4, 4), (i, 0, 0)).save(screenshot_path)
+        entry_id = queue.enqueue(screenshot_path)
+        expected[entry_id] = f"color {i}"
+
+    queue.start()
+    try:
+        # API down: everything stays on disk and the queue reports offline
+        assert wait_for(app, queue.is_offline)
+        assert len(queue.pending_jobs()) == JOBS
+        assert responses == {}
+
+        # API back up on the same port: every job drains to its own entry
+        server = start_server(closed_port)
+        try:
+            queue.wakeup.set()  # Skip the rest of the backoff
+            assert wait_for(app, lambda: len(responses) == JOBS)
+        finally:
+            server.shutdown()
+            server.server_close()
+    finally:
+        queue.stop()
+
+    assert responses == expected
+    assert queue.pending_jobs() == []
+    assert not queue.is_offline()
+
+
+def test_job_failing_on_the_server_gives_up_without_blocking_the_queue(app, closed_port, tmp_path, monkeypatch):
+    monkeypatch.setattr(offline_queue, 'INITIAL_BACKOFF', 0.05)
+    monkeypatch.setattr(ColorCompletionsHandler, 'failing_red', 0)
+    monkeypatch.setattr(ColorCompletionsHandler, 'failures', 0)
+    signals = Signals()
+    responses = {}
+    signals.response_updated.connect(lambda entry_id, text: responses.__setitem__(entry_id, text))
+    queue = OfflineQueue(signals, queue_dir=str(tmp_path / 'queue'), concurrency=4)
+    # Count every request, the client's own retries would hide them
+    queue._client = OpenAI(max_retries=0)
+
+    entry_ids = []
+    for i in range(10):
+        screenshot_path = str(tmp_path / f'capture_{i}.png')
+        Image.new('RGB', (4, 4), (i, 0, 0)).save(screenshot_path)
+        entry_ids.append(queue.enqueue(screenshot_path))
+
+    server = start_server(closed_port)
+    queue.start()
+    try:
+        assert wait_for(app, lambda: len(responses) == len(entry_ids))
+    finally:
+        queue.stop()
+        server.shutdown()
+        server.server_close()
+
+    # The oldest capture keeps failing, it must not hold up the others or take the queue offline
+    assert responses[entry_ids[0]].startswith("Error analyzing image:")
+    assert ColorCompletionsHandler.failures == offline_queue.MAX_JOB_ATTEMPTS
+    assert all(responses[entry_id] == f"color {i}" for i, entry_id in enumerate(entry_ids) if i)
+    assert queue.pending_jobs() == []
+    assert not queue.is_offline()
@@ -0,0 +1,119 @@
+import os
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI
+from vision import encode_png, request_analysis, request_text
+
+# Captures whose longest side exceeds this get tiled in auto mode. The API
+# scales images to fit 2048px and then their short side down to 768px, so a
+# 5760x2160 capture is read at about a third of its size. A 1024px tile is
+# shrunk too, but only to 768px, three quarters of its size.
+DEFAULT_TILE_THRESHOLD = 2048
+TILE_SIZE = 1024
+TILE_OVERLAP = 96
+MAX_PARALLEL_TILES = 8
+MERGE_MAX_TOKENS = 800
+TILING_MODES = ('auto', 'on', 'off')
+
+TILE_PROMPT = (
+    "{prompt}\n\nThis image is tile (row {row}, column {col}) of a {rows}x{cols} grid cut from one "
+    "large screenshot. Neighbouring tiles overlap slightly. Answer only for what is visible in this "
+    "tile and include any text in it verbatim."
+)
+MERGE_PROMPT = (
+    "A large screenshot was split into a {rows}x{cols} grid of overlapping tiles and each tile was "
+    "analyzed separately with the request: \"{prompt}\"\n\n"
+    "Combine the tile answers below into one answer to that request for the whole screenshot. "
+    "Keep all distinct information and text, drop duplicates caused by the overlap, and don't "
+    "mention the tiles.\n\n{answers}"
+)
+
+
+def tiling_mode():
+    """Tiling mode from SNIPCHAT_TILING: auto (by size), on (whenever it splits) or off"""
+    mode = os.getenv('SNIPCHAT_TILING', 'auto').lower()
+    return mode if mode in TILING_MODES else 'auto'
+
+
+def tile_threshold():
+    return int(os.getenv('SNIPCHAT_TILE_THRESHOLD', DEFAULT_TILE_THRESHOLD))
+
+
+def should_tile(size, mode=None, threshold=None):
+    """Decide whether a capture of size (width, height) is analyzed in tiles"""
+    mode = mode or tiling_mode()
+    threshold = threshold if threshold is not None else tile_threshold()
+    if mode == 'off' or max(size) <= TILE_SIZE:
+        return False
+    if mode == 'on':
+        return True
+    return max(size) > threshold
+
+
+def tile_offsets(length, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Start offsets of evenly spread, overlapping tiles covering length pixels"""
+    if length <= tile_size:
+        return [0]
+    count = -(-(length - overlap) // (tile_size - overlap))  # ceil division
+    step = (length - tile_size) / (count - 1)
+    return [round(i * step) for i in range(count)]
+
+
+def split_tiles(size, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Return [(row, col, box)] tile boxes covering an image of size (width, height)"""
+    width, height = size
+    tiles = []
+    for row, top in enumerate(tile_offsets(height, tile_size, overlap)):
+        for col, left in enumerate(tile_offsets(width, tile_size, overlap)):
+            box = (left, top, min(left + tile_size, width), min(top + tile_size, height))
+            tiles.append((row, col, box))
+    return tiles
+
+
+def encode_payload(image, png=None, mode=None, threshold=None):
+    """Encode a capture once for any number of requests
+
+    Returns a list of tiles, each {"img_str", "row", "col", "rows", "cols"}.
+    Captures below the tiling threshold give a single tile holding the
+    whole image. Pass png to reuse PNG bytes that were already encoded.
+    """
+    if not should_tile(image.size, mode, threshold):
+        png = png if png is not None else encode_png(image)
+        return [{"img_str": base64.b64encode(png).decode(), "row": 0, "col": 0, "rows": 1, "cols": 1}]
+
+    # Decode lazily opened files once here, concurrent crops would all try to read the file
+    image.load()
+    boxes = split_tiles(image.size)
+    rows = boxes[-1][0] + 1
+    cols = boxes[-1][1] + 1
+
+    def encode_tile(tile):
+        row, col, box = tile
+        img_str = base64.b64encode(encode_png(image.crop(box))).decode()
+        return {"img_str": img_str, "row": row, "col": col, "rows": rows, "cols": cols}
+
+    with ThreadPoolExecutor(max_workers=min(len(boxes), MAX_PARALLEL_TILES)) as pool:
+        return list(pool.map(encode_tile, boxes))
+
+
+def analyze_payload(payload, prompt, client=None):
+    """Answer a prompt about an encoded capture, analyzing tiles in parallel and merging their answers"""
+    client = client or OpenAI()
+    if len(payload) == 1:
+        return request_analysis(payload[0]["img_str"], prompt, client=client)
+
+    def analyze_tile(tile):
+        tile_prompt = TILE_PROMPT.format(prompt=prompt, row=tile["row"] + 1, col=tile["col"] + 1,
+                                         rows=tile["rows"], cols=tile["cols"])
+        return request_analysis(tile["img_str"], tile_prompt, client=client)
+
+    with ThreadPoolExecutor(max_workers=min(len(payload), MAX_PARALLEL_TILES)) as pool:
+        answers = list(pool.map(analyze_tile, payload))
+
+    rows, cols = payload[0]["rows"], payload[0]["cols"]
+    tile_answers = "\n\n".join(
+        f"Tile (row {tile['row'] + 1}, column {tile['col'] + 1}):\n{answer}"
+        for tile, answer in zip(payload, answers)
+    )
+    merge_prompt = MERGE_PROMPT.format(rows=rows, cols=cols, prompt=prompt, answers=tile_answers)
+    return request_text(merge_prompt, client=client, max_tokens=MERGE_MAX_TOKENS)
@@ -0,0 +1,78 @@
+import base64
+from io import BytesIO
+from openai import OpenAI, APIConnectionError, RateLimitError, InternalServerError
+
+MODEL = "chatgpt-4o-latest"  # Using the latest GPT-4 with vision alias
+SYSTEM_PROMPT = "You are a helpful assistant that analyzes images clearly and concisely."
+DEFAULT_PROMPT = "What's in this image? Describe it clearly but briefly."
+MAX_TOKENS = 300
+# Failures worth retrying later: no connectivity, timeouts, rate limits and server errors
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+
+def encode_png(image):
+    """Encode a PIL image as PNG bytes"""
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def encode_image(image):
+    """Convert a PIL image to a base64 PNG string for the API"""
+    return base64.b64encode(encode_png(image)).decode()
+
+
+def build_messages(img_str, prompt=DEFAULT_PROMPT, mime_type="image/png"):
+    """Build the chat messages asking about a base64 encoded image"""
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": prompt
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{mime_type};base64,{img_str}"
+                    }
+                }
+            ]
+        }
+    ]
+
+
+def request_text(prompt, client=None, max_tokens=MAX_TOKENS):
+    """Send a text-only request to the model and return the response text"""
+    client = client or OpenAI()
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content
+
+
+def request_analysis(img_str, prompt=DEFAULT_PROMPT, client=None):
+    """Send a base64 encoded PNG to the vision model and return the response text"""
+    client = client or OpenAI()
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=build_messages(img_str, prompt),
+        max_tokens=MAX_TOKENS
+    )
+    return response.choices[0].message.content